@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+import importlib
+import json
+import os
+from typing import TYPE_CHECKING, Any, Dict, Set, Tuple
+
+if TYPE_CHECKING:
+    from collections.abc import Hashable, Iterable
+
+    import pandas as pd
+
+
+def import_arrow(module: str = "pyarrow") -> Any:
+    """Import ``module`` of pyarrow, which the optional ``arrow`` extra installs."""
+    try:
+        return importlib.import_module(module)
+    except ImportError as err:
+        raise ImportError(
+            f"{module} is needed to read and write Arrow and Parquet files, "
+            "install it with `pip install legos[arrow]`"
+        ) from err
+
+
+class ChangeLog:
+    """Keys and columns of a DS touched since its last checkpoint.
+
+    ``version`` counts every recorded mutation and never goes back, so it can
+    tell whether a dataset changed since it was last looked at. Deleting a
+    key and writing it again leaves it in both ``deleted`` and ``keys``:
+    replay drops the old row before the new values are applied.
+    """
+
+    def __init__(self) -> None:
+        self.version = 0
+        self.keys: Set[Hashable] = set()
+        self.columns: Set[str] = set()
+        self.deleted: Set[Hashable] = set()
+
+    def updated(self, keys: Iterable[Hashable], columns: Iterable[str]) -> None:
+        self.keys.update(keys)
+        self.columns.update(columns)
+        self.version += 1
+
+    def dropped(self, keys: Iterable[Hashable]) -> None:
+        keys = set(keys)
+        self.keys -= keys
+        self.deleted |= keys
+        self.version += 1
+
+    def checkpoint(self) -> None:
+        """Forget the recorded changes, e.g. after a snapshot or delta save."""
+        self.keys.clear()
+        self.columns.clear()
+        self.deleted.clear()
+
+    def __bool__(self) -> bool:
+        return bool(self.keys or self.deleted)
+
+    def __repr__(self) -> str:
+        return (
+            f"ChangeLog(version={self.version}, keys={len(self.keys)}, "
+            f"columns={sorted(self.columns)}, deleted={len(self.deleted)})"
+        )
+
+
+def write_delta(df: pd.DataFrame, path: str, meta: Dict[str, Any]) -> None:
+    """Write ``df`` (indexed by key) and ``meta`` to a Parquet delta file."""
+    pa = import_arrow()
+    pq = import_arrow("pyarrow.parquet")
+
+    table = pa.Table.from_pandas(df, preserve_index=True)
+    metadata = {**(table.schema.metadata or {}), b"dns": json.dumps(meta).encode()}
+    tmp = f"{path}.{os.getpid()}.tmp"
+    pq.write_table(table.replace_schema_metadata(metadata), tmp)
+    os.replace(tmp, path)
+
+
+def read_delta(path: str) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+    pq = import_arrow("pyarrow.parquet")
+
+    table = pq.read_table(path)
+    meta = json.loads((table.schema.metadata or {}).get(b"dns", b"{}"))
+    return table.to_pandas(), meta
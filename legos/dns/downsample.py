@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+
+def lttb(x: np.ndarray, y: np.ndarray, points: int) -> np.ndarray:
+    """Positions of ``points`` samples of a series sorted on ``x``.
+
+    Largest Triangle Three Buckets: keeps the first and last points and from
+    each bucket in between the one spanning the largest triangle with the
+    point kept before it and the average of the next bucket.
+    """
+    size = len(x)
+    if points >= size or points < 3:  # noqa: PLR2004
+        return np.arange(size)
+    edges = np.linspace(1, size - 1, points - 1).astype(np.intp)
+    picked = np.empty(points, dtype=np.intp)
+    picked[0], picked[-1] = 0, size - 1
+    prev = 0
+    for i in range(points - 2):
+        low, high = edges[i], edges[i + 1]
+        after = edges[i + 2] if i + 2 < len(edges) else size
+        avg_x, avg_y = x[high:after].mean(), y[high:after].mean()
+        area = np.abs(
+            (x[prev] - avg_x) * (y[low:high] - y[prev])
+            - (x[prev] - x[low:high]) * (avg_y - y[prev])
+        )
+        prev = low + int(np.argmax(area))
+        picked[i + 1] = prev
+    return picked
+
+
+def minmax(x: np.ndarray, y: np.ndarray, points: int) -> np.ndarray:
+    """Sorted positions of the lowest and highest ``y`` per bucket of ``x``.
+
+    ``x`` needs no order: it is cut into ``points // 2`` equal width buckets.
+    """
+    if points >= len(x):
+        return np.arange(len(x))
+    buckets = max(points // 2, 1)
+    low, span = x.min(), x.max() - x.min()
+    bucket = np.minimum(
+        ((x - low) / (span or 1) * buckets).astype(np.intp), buckets - 1
+    )
+    grouped = pd.Series(y).groupby(bucket)
+    return np.unique(np.concatenate([grouped.idxmin(), grouped.idxmax()]))
+
+
+DOWNSAMPLERS: Dict[str, Callable[[np.ndarray, np.ndarray, int], np.ndarray]] = {
+    "lttb": lttb,
+    "minmax": minmax,
+}
+
+
+def _numeric(values: pd.Series) -> Optional[np.ndarray]:
+    if values.dtype.kind == "M":
+        out = values.to_numpy(dtype="datetime64[ns]").view(np.int64).astype(float)
+        out[values.isna().to_numpy()] = np.nan
+        return out
+    if values.dtype.kind in "iufb":
+        return values.to_numpy(dtype=float, na_value=np.nan)
+    return None
+
+
+def downsample(
+    df: pd.DataFrame, x: str, y: str, points: int, method: str = "lttb"
+) -> pd.DataFrame:
+    """Rows of ``df`` keeping the shape of ``y`` over ``x`` in about ``points``.
+
+    Series with a non numeric ``x`` or ``y``, or already within ``points``,
+    are returned whole. Rows missing ``x`` or ``y`` are left out otherwise.
+    """
+    if method not in DOWNSAMPLERS:
+        raise ValueError(f"Unknown downsampling {method}, use one of {DOWNSAMPLERS}")
+    xs, ys = _numeric(df[x]), _numeric(df[y])
+    if xs is None or ys is None or len(df) <= points:
+        return df
+    rows = np.flatnonzero(~np.isnan(xs) & ~np.isnan(ys))
+    if method == "lttb":
+        rows = rows[np.argsort(xs[rows], kind="stable")]
+    return df.iloc[rows[DOWNSAMPLERS[method](xs[rows], ys[rows], points)]]
+
+
+def chart_data(
+    df: pd.DataFrame,
+    kind: str,
+    x: str,
+    y: str,
+    hue: Optional[str] = None,
+    max_points: Optional[int] = None,
+    method: str = "lttb",
+) -> pd.DataFrame:
+    """Data of a ``bar`` or ``line`` chart reduced for drawing, sorted on ``x``.
+
+    Bars sum numeric ``y`` per ``x`` and ``hue``, as stacked bars would
+    show them. Lines keep up to ``max_points`` per ``hue`` series, see
+    :func:`downsample`. Only the reduced rows are sorted.
+    """
+    if max_points is None or not isinstance(y, str) or not isinstance(x, str):
+        return df.sort_values(by=x, kind="stable")
+    by: List[str] = [x] if not hue or hue == x else [x, hue]
+    if kind == "bar":
+        if df[y].dtype.kind not in "iufb":
+            return df.sort_values(by=x, kind="stable")
+        reduced = (
+            df.groupby(by, observed=True, dropna=False, sort=False)[y]
+            .sum()
+            .reset_index()
+        )
+    elif hue and hue != x:
+        groups = df.groupby(hue, observed=True, dropna=False, sort=False).indices
+        reduced = pd.concat(
+            [
+                downsample(df.iloc[rows], x, y, max_points, method)
+                for rows in groups.values()
+            ]
+        )
+    else:
+        reduced = downsample(df, x, y, max_points, method)
+    return reduced.sort_values(by=x, kind="stable")
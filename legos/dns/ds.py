@@ -1,16 +1,179 @@
 from __future__ import annotations
 
+import hashlib
+import json
+import os
+from collections.abc import Iterator, Mapping
 from itertools import islice
-from typing import TYPE_CHECKING, Any, Dict, List, Optional, Union
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional, Tuple, Union
 
+import numpy as np
 import pandas as pd
 
-from .reader import Reader
-from .utils import df_pytypes, icf, xlate, xlation_map
+from .changelog import ChangeLog, import_arrow, read_delta, write_delta
+from .index import (
+    INDEXES,
+    ColumnIndex,
+    index_key,
+    match_positions,
+    sort_ranks,
+    top_positions,
+)
+from .kv import KV
+from .reader import CHUNKSIZE, Reader
+from .utils import df_keys, df_pytypes, flatten_nested, icf, xlate, xlation_map
 
 if TYPE_CHECKING:
     from ntypes import SourceTypeVar, StrLStrTypeVar
 
+    from .lazy import LazyDS
+
+
+def _check_unique(index: pd.Index) -> None:
+    if not index.is_unique:
+        dups = index[index.duplicated()].unique().tolist()
+        raise ValueError(f"Duplicate keys: {dups[:5]}")
+
+
+def _write_arrow(df: pd.DataFrame, path: str, meta: Dict[str, Any]) -> None:
+    pa = import_arrow()
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    metadata = {**(table.schema.metadata or {}), b"dns": json.dumps(meta).encode()}
+    table = table.replace_schema_metadata(metadata)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with pa.OSFile(tmp, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    os.replace(tmp, path)
+
+
+def _read_arrow(path: str) -> tuple[pd.DataFrame, Dict[str, Any]]:
+    pa = import_arrow()
+
+    table = pa.ipc.open_file(pa.memory_map(path)).read_all()
+    meta = json.loads((table.schema.metadata or {}).get(b"dns", b"{}"))
+    return table.to_pandas(types_mapper=pd.ArrowDtype), meta
+
+
+def _share_arrow(df: pd.DataFrame, deep: bool) -> pd.DataFrame:
+    """Copy of ``df`` sharing the immutable buffers of its Arrow columns.
+
+    Arrow columns get their own array over the same, e.g. memory mapped,
+    buffers; other columns are copied when ``deep``.
+    """
+    out = df.copy(deep=False)
+    for i, (_, values) in enumerate(df.items()):
+        if isinstance(values.dtype, pd.ArrowDtype):
+            chunks = values.array.__arrow_array__()
+            out.isetitem(i, pd.arrays.ArrowExtensionArray(chunks))
+        elif deep:
+            out.isetitem(i, values.copy())
+    return out
+
+
+JOINS = ("inner", "left", "right", "outer", "anti")
+
+
+def join_keyed(
+    ldf: pd.DataFrame,
+    rdf: pd.DataFrame,
+    how: str,
+    keycols: List[str],
+    rsuffix: str,
+    lsuffix: Optional[str] = None,
+    on: Optional[pd.Series] = None,
+) -> pd.DataFrame:
+    """Join ``rdf`` onto ``ldf`` by the right frame's unique ``key`` index.
+
+    The left side matches on its own index, or on ``on`` (join keys aligned
+    with the left rows) when it is keyed on other fields. ``keycols`` are key
+    fields present on both sides: they are kept once and filled from the
+    right for keys only found there. Other shared columns get ``rsuffix``
+    (and ``lsuffix`` on the left, when given). Right rows are gathered with
+    a single reindex, so only the output is allocated.
+    """
+    if how not in JOINS:
+        raise ValueError(f"Unknown join {how}, use one of {JOINS}")
+    if not rdf.index.is_unique:
+        raise ValueError(
+            "Right keys are not unique, many to many joins are not supported"
+        )
+    lkey = ldf.index if on is None else pd.Index(on)
+    if how == "anti":
+        return ldf[~lkey.isin(rdf.index)]
+    if on is not None and how not in ("inner", "left"):
+        raise ValueError(f"A {how} join must match on the left keys")
+
+    shared = [col for col in rdf.columns if col in ldf.columns]
+    keycols = [col for col in keycols if col in shared]
+    rcols = [col for col in rdf.columns if col not in keycols]
+    renames = {col: f"{col}_{rsuffix}" for col in shared if col not in keycols}
+
+    left = ldf
+    if how == "inner":
+        mask = lkey.isin(rdf.index)
+        left, lkey = ldf[mask], lkey[mask]
+    elif how == "right":
+        left = ldf.reindex(rdf.index)
+    elif how == "outer":
+        left = ldf.reindex(ldf.index.union(rdf.index, sort=False))
+    if how in ("right", "outer"):
+        lkey = left.index
+
+    right = rdf.reindex(index=lkey, columns=rcols).rename(columns=renames)
+    right.index = left.index
+    if lsuffix:
+        left = left.rename(columns={col: f"{col}_{lsuffix}" for col in renames})
+    joined = pd.concat([left, right], axis=1, copy=False)
+    if keycols and how in ("right", "outer"):
+        fill = rdf[keycols].reindex(joined.index)
+        joined[keycols] = joined[keycols].combine_first(fill)
+    return joined
+
+
+def _split_keys(keys: StrLStrTypeVar) -> List[str]:
+    if isinstance(keys, str):
+        keys = keys.split(",")
+    return [xlate(key)[0] for key in keys or []]
+
+
+class Children(Mapping[str, "DS"]):
+    """Child datasets of a DS, flattened from their nested column on first access."""
+
+    def __init__(
+        self, drop_nested: bool = True, built: Optional[Dict[str, DS]] = None
+    ) -> None:
+        self.drop_nested = drop_nested
+        self._built: Dict[str, DS] = dict(built or {})
+        self._nested: Dict[str, tuple[pd.Series, List[str]]] = {}
+        self._names: List[str] = list(self._built)
+
+    def add(self, name: str, nested: pd.Series, keys: List[str]) -> None:
+        self._nested[name] = (nested, keys)
+        self._names.append(name)
+
+    def nested(self, name: str) -> Optional[pd.Series]:
+        """Nested column of ``name``, unless it was dropped after materializing."""
+        return self._nested[name][0] if name in self._nested else None
+
+    def __getitem__(self, name: str) -> DS:
+        if name not in self._built:
+            nested, keys = self._nested[name]
+            self._built[name] = DS(flatten_nested(nested), keys=keys, copy=False)
+            if self.drop_nested:
+                del self._nested[name]
+        return self._built[name]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._names)
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def __repr__(self) -> str:
+        state = {name: name in self._built for name in self._names}
+        return f"Children(built={state})"
+
 
 class DS:
     def __init__(
@@ -18,7 +181,27 @@ class DS:
         source: SourceTypeVar,
         keys: StrLStrTypeVar = None,
         children: Optional[Dict[str, Any]] = None,
+        kv_cache: int = 256,
+        copy: bool = True,
+        arrow: Optional[str] = None,
+        drop_nested: bool = True,
     ):
+        """Keyed dataset over ``source``.
+
+        With ``copy=False`` the DS takes ownership of a DataFrame source: it is
+        renamed and keyed in place, no pristine copy is kept and
+        ``df_humanized`` shares its data with ``df``.
+
+        With ``arrow`` set to a file path the keyed frame is written there as
+        Arrow IPC and ``df`` is backed by a read-only memory map of that file,
+        see :meth:`to_arrow`.
+
+        Child datasets named in ``children`` are built on first access to
+        ``self.children``; with ``drop_nested`` the nested column is released
+        once its child exists.
+        """
+        self._copy = copy
+        self._drop_nested = drop_nested
         if keys is None:
             keys = []
         if children is None:
@@ -34,19 +217,27 @@ class DS:
         self.df = refs["df"]
         self.children = refs["children"]
 
-        self.xlations = xlation_map(self.df.columns)
-        if self.xlations.get("var"):
-            del self.xlations["var"]
+        self.xlations = {"human": refs["xlations"]["human"]}
 
-        self.kv = refs["kv"]
+        self.kv = KV(self, maxsize=kv_cache)
+        self.changes = ChangeLog()
+        self.indexes: Dict[Tuple[str, Tuple[str, ...]], ColumnIndex] = {}
+        self._hashes: Dict[str, str] = {}
+        self._ranks: Dict[Tuple[str, ...], Tuple[int, np.ndarray]] = {}
         self.length = self.df.count()
+        if not copy:
+            self._odf = None
+        if arrow:
+            self.to_arrow(arrow)
+            self.df, _ = _read_arrow(arrow)
+            if self.keys:
+                self.df.set_index("key", inplace=True)  # type: ignore  # noqa: PGH003
 
     def _to_df(self, data: SourceTypeVar) -> None:
-        xp, xdf = Reader().to_df(data)
-        xlations = xlation_map(list(xdf.columns))
-        xdf.columns = [xlations["var"].get(col) for col in xdf.columns]
+        xp, xdf = Reader(copy=self._copy).to_df(data)
+        xdf.columns = [xlate(col)[0] for col in xdf.columns]
         self.protocol: str = xp
-        self._odf: pd.DataFrame = xdf
+        self._odf: Optional[pd.DataFrame] = xdf
 
     def _xdf(
         self,
@@ -57,7 +248,9 @@ class DS:
             children = {}
         if keys is None:
             keys = []
-        df: pd.DataFrame = self._odf.copy()
+        if self._odf is None:
+            raise ValueError("Source frame was released after construction")
+        df: pd.DataFrame = self._odf.copy() if self._copy else self._odf
         self.keys = [xlate(var)[0] for var in keys]
         schema = df_pytypes(df)
         nested = [col for col, ptype in schema.items() if ptype == "pd"]
@@ -66,13 +259,9 @@ class DS:
                 df[col] = df[col].dt.strftime("%Y-%m-%d")
 
         if self.keys:
-            unknown = set(self.keys) - set(df.columns)
-            if unknown:
-                raise ValueError(f"Unknown keys: {unknown}")
-            df["key"] = df[self.keys].astype(str).agg("|".join, axis=1)  # type: ignore  # noqa: PGH003
-            df.set_index("key", inplace=True)  # type: ignore  # noqa: PGH003
+            self._set_key(df)
 
-        nodes: Dict[str, "DS"] = {}
+        nodes = Children(drop_nested=self._drop_nested)
 
         for k, val in (children or {}).items():
             child = xlate(k)[0]
@@ -82,26 +271,183 @@ class DS:
             if ccols:
                 if isinstance(ccols, str):
                     ccols = ccols.split(",")
-                ndf = pd.concat(df[child].tolist(), keys=df.index)
-                ndf["pkey"] = ndf.index.get_level_values(0)
-                ndf.reset_index(inplace=True, drop=True)
-                ckeys: List[str] = ["pkey", *ccols]
-                nodes[child] = DS(ndf, keys=ckeys)
+                # a copy, as a view would keep the frame's object block alive
+                nodes.add(child, df[child].copy(), ["pkey", *ccols])
 
         for child in nested:
             df.drop(child, axis=1, inplace=True)
+        if nested and df is not self._odf:
+            self._odf.drop(columns=nested, inplace=True)
 
         return {
             "schema": df_pytypes(df),
             "df": df,
             "xlations": xlation_map(list(df.columns)),
             "children": nodes,
-            "kv": df.to_dict(orient="index"),
         }
 
+    def _set_key(self, df: pd.DataFrame) -> None:
+        unknown = set(self.keys) - set(df.columns)
+        if unknown:
+            raise ValueError(f"Unknown keys: {unknown}")
+        df["key"] = df_keys(df, self.keys)
+        df.set_index("key", inplace=True)  # type: ignore  # noqa: PGH003
+        _check_unique(df.index)
+
+    @classmethod
+    def from_chunks(
+        cls,
+        source: SourceTypeVar,
+        keys: StrLStrTypeVar = None,
+        children: Optional[Dict[str, Any]] = None,
+        chunksize: int = CHUNKSIZE,
+        **kwargs: Any,
+    ) -> DS:
+        """Build a DS by streaming ``source`` through ``Reader.iter_chunks``.
+
+        Every chunk is keyed, typed and flattened on its own and only the keyed
+        frames are kept, so the raw source is never parsed in one piece.
+        ``kwargs`` are passed to the reader.
+        """
+        reader = Reader(**kwargs)
+        protocol, _ = reader._infer_parser(source)
+        parts = [
+            cls(chunk, keys=keys, children=children, copy=False)
+            for chunk in reader.iter_chunks(source, chunksize)
+        ]
+        if parts:
+            ds = cls._merge(parts)
+        else:
+            ds = cls._from_keyed(pd.DataFrame(), {"keys": _split_keys(keys)})
+        ds.protocol = protocol
+        return ds
+
+    @classmethod
+    def _merge(cls, parts: List[DS], parents: Optional[Dict[str, str]] = None) -> DS:
+        """One DS of keyed ``parts``, e.g. the chunks of a source.
+
+        Key fields are concatenated to one dtype before the keys are made
+        final, so a value keyed ``3`` in an int chunk and ``3.0`` in a chunk
+        where missing values made it float gets one key, as in a whole read.
+        ``parents`` maps the chunk keys of a parent to its final keys.
+        """
+        keys = parts[0].keys
+        keyed = pd.concat([part.df for part in parts])
+        chunk_keys = keyed.index
+        if parents and "pkey" in keyed.columns:
+            keyed["pkey"] = keyed["pkey"].map(lambda key: parents.get(key, key))
+        if keys and (
+            parents
+            or any(
+                part.df[field].dtype != keyed[field].dtype
+                for part in parts
+                for field in keys
+            )
+        ):
+            keyed.index = pd.Index(df_keys(keyed, keys), name=chunk_keys.name)
+        ds = cls._from_keyed(keyed, {"keys": keys})
+        if ds.keys:
+            _check_unique(ds.df.index)
+        rekeyed = None
+        if not ds.df.index.equals(chunk_keys):
+            rekeyed = dict(zip(chunk_keys, ds.df.index))
+        ds.children = Children(
+            built={
+                name: cls._merge([part.children[name] for part in parts], rekeyed)
+                for name in parts[0].children
+            }
+        )
+        return ds
+
+    @classmethod
+    def _from_keyed(cls, df: pd.DataFrame, meta: Dict[str, Any]) -> DS:
+        keys = meta.get("keys") or []
+        if keys and "key" in df.columns:
+            df.set_index("key", inplace=True)  # type: ignore  # noqa: PGH003
+        ds = cls(df, copy=False)
+        ds.keys = keys
+        ds.protocol = meta.get("protocol", ds.protocol)
+        return ds
+
+    @classmethod
+    def lazy(
+        cls, source: SourceTypeVar, keys: StrLStrTypeVar = None, **kwargs: Any
+    ) -> LazyDS:
+        """Deferred DS over ``source`` that reads only what it is asked for.
+
+        See :class:`dns.lazy.LazyDS`; ``kwargs`` are passed to it.
+        """
+        from .lazy import LazyDS
+
+        return LazyDS(source, keys=keys, **kwargs)
+
+    def to_arrow(self, path: str) -> str:
+        """Write the keyed frame to an uncompressed Arrow IPC file.
+
+        Processes that open it with :meth:`from_arrow` share one page cache
+        copy of the data. Children are not written.
+        """
+        df = self.df.reset_index() if self.keys else self.df
+        _write_arrow(df, path, {"keys": self.keys, "protocol": self.protocol})
+        self.changes.checkpoint()
+        return path
+
+    @classmethod
+    def from_arrow(cls, path: str, deltas: Iterable[str] = ()) -> DS:
+        """Open a DS written by :meth:`to_arrow` as a read-only memory map.
+
+        Columns use ``pd.ArrowDtype`` over the mapped buffers, so nothing is
+        copied until a column is modified. ``deltas`` written by
+        :meth:`save_delta` are replayed in order on top of the snapshot.
+        """
+        ds = cls._from_keyed(*_read_arrow(path))
+        for delta in deltas:
+            ds.apply_delta(delta)
+        ds.changes.checkpoint()
+        return ds
+
+    def save_delta(self, path: str) -> Optional[str]:
+        """Write the rows changed since the last checkpoint to Parquet.
+
+        Only the changed keys and columns are written, along with the keys
+        dropped, changed keys no longer in the frame included, and the change
+        log is reset. Returns ``None`` without writing
+        when nothing changed.
+        """
+        if not self.changes:
+            return None
+        keys = list(self.changes.keys)
+        positions = self.df.index.get_indexer(keys)
+        gone = {key for key, pos in zip(keys, positions) if pos < 0}
+        rows = self.df.iloc[
+            np.sort(positions[positions >= 0]),
+            self.df.columns.isin(self.changes.columns),
+        ]
+        meta = {
+            "keys": self.keys,
+            "version": self.changes.version,
+            "deleted": sorted(self.changes.deleted | gone),
+        }
+        write_delta(rows, path, meta)
+        self.changes.checkpoint()
+        return path
+
+    def apply_delta(self, path: str) -> None:
+        """Replay a delta written by :meth:`save_delta` onto this dataset."""
+        rows, meta = read_delta(path)
+        deleted = self.df.index.intersection(meta.get("deleted", []))
+        if len(deleted):
+            self.df = self.df.drop(index=deleted)
+            self._dropped(deleted)
+        if len(rows):
+            self.update_many(rows)
+
     @property
     def df_humanized(self) -> pd.DataFrame:
-        hdf = self.df.copy()
+        if any(isinstance(dtype, pd.ArrowDtype) for dtype in self.df.dtypes):
+            hdf = _share_arrow(self.df, self._copy)
+        else:
+            hdf = self.df.copy(deep=self._copy)
         hdf.columns = [self.xlations["human"].get(col, col) for col in hdf.columns]
         return hdf
 
@@ -115,47 +461,234 @@ class DS:
         return self.kv.get(key) or {}
 
     def __setitem__(self, key: str, value: Any) -> None:
-        v: Dict[str, Any] = self.kv.get(key) or {}
-        v |= value
-        try:
-            self.df.loc[key] = v
-        except KeyError as err:
-            raise ValueError(f"Key missing {key}") from err
-        self.kv[key] = v
+        self.update_many({key: value})
+
+    def update_many(
+        self, changes: Union[Mapping[str, Dict[str, Any]], pd.DataFrame]
+    ) -> List[str]:
+        """Apply a batch of keyed changes with one aligned write per column.
+
+        ``changes`` maps keys to ``{column: value}`` or is a frame indexed by
+        key. Existing rows are updated in place, unknown keys are appended with
+        a single concat (key fields filled from the key when not given) and
+        unknown columns are added. Missing (NaN) values keep the current value.
+        Returns the appended keys.
+        """
+        cdf = (
+            changes
+            if isinstance(changes, pd.DataFrame)
+            else pd.DataFrame.from_dict(dict(changes), orient="index")
+        )
+        cdf = cdf.rename(columns=lambda col: xlate(col)[0])
+        _check_unique(cdf.index)
+        new_cols = [col for col in cdf.columns if col not in self.df.columns]
+        fresh = cdf.index[self.df.index.get_indexer(cdf.index) < 0]
+        if len(fresh):
+            rows = cdf.loc[fresh]
+            for field, part in self._key_fields(fresh).items():
+                rows[field] = rows[field].fillna(part) if field in rows else part
+            rows.index.name = self.df.index.name
+            self.df = pd.concat([self.df, rows])
+            cdf = cdf.drop(index=fresh)
+        for col, values in cdf.items():
+            given = values.dropna()
+            if len(given):
+                self.df.loc[given.index, col] = given
+        self._changed(
+            cdf.index.append(fresh), list(cdf.columns), new_cols, rows=bool(len(fresh))
+        )
+        return fresh.tolist()
+
+    def upsert(self, df: pd.DataFrame) -> List[str]:
+        """Insert or update the rows of ``df``, see :meth:`update_many`.
+
+        Rows are keyed from this dataset's key fields when ``df`` has them as
+        columns, otherwise ``df`` must already be indexed by key.
+        """
+        df = df.rename(columns=lambda col: xlate(col)[0])
+        if self.keys and set(self.keys) <= set(df.columns):
+            df = df.set_axis(df_keys(df, self.keys), axis=0)
+        return self.update_many(df)
+
+    def _key_fields(self, keys: pd.Index) -> Dict[str, pd.Series]:
+        """Key field values of ``keys``, cast to their column dtype if they can."""
+        if not self.keys:
+            return {}
+        parts = keys.to_series().str.split("|", n=len(self.keys) - 1, expand=True)
+        fields = {}
+        for i, field in enumerate(self.keys):
+            if i not in parts.columns:
+                continue
+            fields[field] = parts[i]
+            if field in self.df.columns:
+                try:
+                    fields[field] = parts[i].astype(self.df[field].dtype)
+                except (ValueError, TypeError):
+                    pass
+        return fields
+
+    def _changed(
+        self, keys: pd.Index, columns: List[str], new_cols: List[str], rows: bool
+    ) -> None:
+        self.kv.invalidate(*keys)
+        self.changes.updated(keys, columns)
+        touched = [
+            index
+            for index in self.indexes.values()
+            if rows or set(index.cols) & set(columns)
+        ]
+        positions = self.df.index.get_indexer(keys) if touched and not rows else None
+        for index in touched:
+            if positions is None:
+                index.stale = True
+            else:
+                index.patch(positions)
+        if rows:
+            self._hashes.clear()
+        for col in columns:
+            self._hashes.pop(col, None)
+        self.schema = df_pytypes(self.df)
+        self.xlations["human"].update(xlation_map(new_cols)["human"])
+        self.length = self.df.count()
+
+    def _dropped(self, keys: Iterable[str]) -> None:
+        keys = list(keys)
+        self.kv.invalidate(*keys)
+        self.changes.dropped(keys)
+        for index in self.indexes.values():
+            index.stale = True
+        self._hashes.clear()
+        self.length = self.df.count()
+
+    def column_hash(self, col: str) -> str:
+        """Content hash of ``col`` and the keys of its rows.
+
+        Hashes are kept until the column or the set of rows is changed
+        through this DS, so unchanged columns are hashed once.
+        """
+        digest = self._hashes.get(col)
+        if digest is None:
+            try:
+                hashed = pd.util.hash_pandas_object(self.df[col])
+            except TypeError:
+                hashed = pd.util.hash_pandas_object(self.df[col].astype(str))
+            digest = hashlib.sha256(hashed.to_numpy().tobytes()).hexdigest()
+            self._hashes[col] = digest
+        return digest
+
+    def create_index(self, cols: StrLStrTypeVar, kind: str = "hash") -> ColumnIndex:
+        """Build a secondary index over ``cols``.
+
+        ``hash`` indexes serve equality and ``in`` lookups on one or more
+        columns, ``sorted`` indexes serve ``between`` lookups on one column.
+        Both are used by :meth:`unique` and :meth:`match` and are rebuilt on
+        first use after their columns or the rows of the dataset changed.
+        """
+        cols = _split_keys(cols)
+        unknown = set(cols) - set(self.df.columns)
+        if unknown:
+            raise ValueError(f"Unknown index fields: {unknown}")
+        ikey = index_key(cols, kind)
+        index = INDEXES[kind](self.df, cols)
+        self.indexes[ikey] = index
+        return index
+
+    def _index(self, cols: List[str], kind: str) -> Optional[Any]:
+        index = self.indexes.get((kind, tuple(cols)))
+        if index is not None and not index.covers(self.df):
+            index.build(self.df)
+        elif index is not None:
+            index.sync(self.df)
+        return index
 
     def unique(self, cols: StrLStrTypeVar) -> List[str]:
+        index = self._index(_split_keys(cols), "hash")
+        if index is not None:
+            if len(index.patched):
+                index.build(self.df)
+            return index.unique()
         try:
-            return list(self.df[cols].astype(str).agg("|".join, axis=1).unique())
+            return list(df_keys(self.df, cols).unique())
         except KeyError as err:
             raise ValueError(f"One of the fields {cols} not found in dataset") from err
 
+    def match(self, conditions: Dict[str, Any]) -> pd.DataFrame:
+        """Rows meeting every condition of ``conditions``.
+
+        Each field maps to a value (equality), a list of values (``in``) or a
+        ``{"in": [...]}``, ``{"between": [low, high]}`` or ``{"regex": ...}``
+        operator; ``and``/``or`` take a list of such condition maps and
+        ``not`` one. Equality and ``in`` use a hash index on the field and
+        ``between`` a sorted one when present, anything else scans the column.
+        """
+        return self.df.take(match_positions(self.df, conditions, self._index))
+
+    def top(
+        self, cols: StrLStrTypeVar, limit: int = 10, offset: int = 0
+    ) -> pd.DataFrame:
+        """Rows ``offset`` to ``offset + limit`` in ascending order of ``cols``.
+
+        Same rows as ``df.sort_values(cols)[offset:offset + limit]`` without
+        sorting the frame. Row ranks on ``cols`` are kept until the DS
+        changes, so further pages and tables on them only select.
+        """
+        return self.df.take(self._top_positions(_split_keys(cols), limit, offset))
+
+    def _top_positions(self, cols: List[str], limit: int, offset: int) -> np.ndarray:
+        version, ranks = self._ranks.get(tuple(cols), (None, None))
+        if (
+            ranks is None
+            or version != self.changes.version
+            or len(ranks) != len(self.df)
+        ):
+            missing = [col for col in cols if col not in self.df.columns]
+            if missing:
+                raise ValueError(f"Fields {missing} not found in dataset")
+            ranks = sort_ranks(self.df, cols)
+            self._ranks[tuple(cols)] = (self.changes.version, ranks)
+        return top_positions(ranks, limit, offset)
+
     def join(
         self,
-        other: "DS",
-        on: Optional[Union[str, List[str]]] = None,
+        other: DS,
+        on: StrLStrTypeVar = None,
         how: str = "inner",
         lsuffix: str = "a",
         rsuffix: str = "b",
-        lkeys: Optional[Union[str, List[str]]] = None,
-        rkeys: Optional[Union[str, List[str]]] = None,
-    ) -> "DS":
-        def _prepare_df(df: pd.DataFrame, kys: Any, suffix: str) -> pd.DataFrame:
-            keys: List[str] = (
-                kys.split(",")
-                if isinstance(kys, str)
-                else kys
-                if isinstance(kys, list)
-                else ["key"]
-            )
-            dfk: pd.DataFrame = df.copy()
-            dfk["key"] = df[keys].astype(str).agg("|".join, axis=1)
-            dfk.columns = [f"{col}-{suffix}" for col in dfk.columns]
-            return dfk
-
-        ldf = _prepare_df(self.df, lkeys, lsuffix)
-        rdf = _prepare_df(self.df, rkeys, rsuffix)
-        joined = ldf.join(rdf, on=on, how=how)  # type: ignore  # noqa: PGH003
-        return DS(joined, keys=self.keys)
+        lkeys: StrLStrTypeVar = None,
+        rkeys: StrLStrTypeVar = None,
+        validate: Optional[str] = None,
+    ) -> DS:
+        """Join ``other`` onto this dataset by key.
+
+        Both sides match on their existing key index unless ``on`` (or
+        ``lkeys``/``rkeys``) name other fields, in which case only that side's
+        keys are built. ``how`` is one of inner, left, right, outer or anti.
+        Right keys must be unique; ``validate="one_to_one"`` also requires
+        unique left keys. Shared non key columns are suffixed with
+        ``lsuffix``/``rsuffix``. The result keeps this dataset's keys.
+        """
+        lk = _split_keys(lkeys or on) or self.keys
+        rk = _split_keys(rkeys or on) or other.keys
+        if not lk or not rk:
+            raise ValueError("Both datasets need keys to join")
+        if len(lk) != len(rk):
+            raise ValueError(f"Key fields {lk} and {rk} do not pair up")
+
+        if validate not in (None, "one_to_one", "1:1", "many_to_one", "m:1"):
+            raise ValueError(f"Unknown validation {validate}")
+
+        rdf = other.df
+        if rk != other.keys:
+            rdf = rdf.copy(deep=False)
+            rdf.index = df_keys(rdf, rk)
+        lon = None if lk == self.keys else df_keys(self.df, lk)
+        if validate in ("one_to_one", "1:1") and lon is not None and not lon.is_unique:
+            raise ValueError(f"Left keys {lk} are not unique")
+
+        common = [key for key in lk if key in rk]
+        joined = join_keyed(self.df, rdf, how, common, rsuffix, lsuffix, on=lon)
+        return DS._from_keyed(joined, {"keys": self.keys, "protocol": self.protocol})
 
     def __str__(self) -> str:
         kvs = dict(islice(self.kv.items(), 5))
@@ -0,0 +1,295 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .utils import df_keys, xlate
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Hashable, Iterable
+
+
+PATCHED_ROWS = 1024
+
+
+class ColumnIndex:
+    """Secondary index over columns of a DS frame, holding row positions.
+
+    Rows rewritten in place since the last build are ``patched``: lookups
+    answer them from their current values. Indexes are marked ``stale``
+    when the set of rows changes or more than ``PATCHED_ROWS`` rows are
+    patched, and are rebuilt by their DS on next use.
+    """
+
+    def __init__(self, df: pd.DataFrame, cols: List[str]) -> None:
+        self.cols = cols
+        self.stale = False
+        self.build(df)
+
+    def build(self, df: pd.DataFrame) -> None:
+        self.rows = len(df)
+        self.stale = False
+        self.patched = np.array([], dtype=np.intp)
+        self.current: Any = None
+
+    def covers(self, df: pd.DataFrame) -> bool:
+        return not self.stale and self.rows == len(df)
+
+    def patch(self, positions: np.ndarray) -> None:
+        """Record the rows at ``positions`` as rewritten since the build."""
+        self.patched = np.union1d(self.patched, positions).astype(np.intp)
+        self.current = None
+        if len(self.patched) > PATCHED_ROWS:
+            self.stale = True
+
+    def sync(self, df: pd.DataFrame) -> None:
+        """Read the current values of the patched rows of ``df``."""
+        if len(self.patched) and self.current is None:
+            self.current = self._values(df.iloc[self.patched])
+
+    def _values(self, df: pd.DataFrame) -> Any:
+        if len(self.cols) == 1:
+            return df[self.cols[0]]
+        return pd.MultiIndex.from_arrays([df[col] for col in self.cols])
+
+    def _patched(self, found: np.ndarray, hits: Any) -> np.ndarray:
+        """``found`` with the patched rows replaced by those in ``hits``."""
+        if not len(self.patched):
+            return found
+        found = np.setdiff1d(found, self.patched, assume_unique=True)
+        if isinstance(hits, pd.Series):
+            hits = hits.to_numpy(dtype=bool, na_value=False)
+        hits = self.patched[np.asarray(hits, dtype=bool)]
+        return np.union1d(found, hits).astype(np.intp)
+
+    def __repr__(self) -> str:
+        state = ", stale" if self.stale else ""
+        if len(self.patched):
+            state += f", patched={len(self.patched)}"
+        return f"{type(self).__name__}({self.cols}, rows={self.rows}{state})"
+
+
+class HashIndex(ColumnIndex):
+    """Row positions per distinct value of one column, or value tuple of several.
+
+    Values are kept in order of first appearance.
+    """
+
+    def build(self, df: pd.DataFrame) -> None:
+        codes, uniques = pd.factorize(self._values(df), use_na_sentinel=False)
+        self.uniques = uniques
+        self.order = np.argsort(codes, kind="stable")
+        self.bounds = np.concatenate(
+            ([0], np.cumsum(np.bincount(codes, minlength=len(uniques))))
+        )
+        self.codes: Dict[Hashable, int] = {
+            value: code for code, value in enumerate(uniques)
+        }
+        super().build(df)
+
+    def positions(self, values: Iterable[Hashable]) -> Optional[np.ndarray]:
+        """Sorted row positions holding any of ``values``.
+
+        ``None`` when ``values`` has a missing value, which only a scan
+        matches as :meth:`pandas.Series.isin` does.
+        """
+        values = list(values)
+        if any(pd.api.types.is_scalar(value) and pd.isna(value) for value in values):
+            return None
+        found = [
+            self.order[self.bounds[code] : self.bounds[code + 1]]
+            for code in (self.codes.get(value) for value in values)
+            if code is not None
+        ]
+        rows = np.sort(np.concatenate(found)) if found else np.array([], np.intp)
+        if len(self.patched):
+            rows = self._patched(rows, self.current.isin(values))
+        return rows
+
+    def unique(self) -> List[str]:
+        """Distinct values as ``a|b`` strings, see :meth:`DS.unique`."""
+        if isinstance(self.uniques, pd.MultiIndex):
+            return df_keys(
+                self.uniques.to_frame(index=False, name=self.cols), self.cols
+            ).tolist()
+        return pd.Series(self.uniques).astype(str).tolist()
+
+
+class SortedIndex(ColumnIndex):
+    """Non null values of one column in sorted order, for range lookups."""
+
+    def build(self, df: pd.DataFrame) -> None:
+        if len(self.cols) != 1:
+            raise ValueError(f"Sorted indexes take one column, got {self.cols}")
+        col = self._values(df)
+        valid = col.notna().to_numpy()
+        values = col.to_numpy()[valid]
+        order = np.argsort(values, kind="stable")
+        self.values = values[order]
+        self.order = np.flatnonzero(valid)[order]
+        super().build(df)
+
+    def _bound(self, value: Any) -> Any:
+        if self.values.dtype.kind in "mM":
+            return np.asarray(pd.Timestamp(value), dtype=self.values.dtype)
+        return value
+
+    def between(self, low: Any = None, high: Any = None) -> np.ndarray:
+        """Sorted row positions with ``low <= value <= high``; ``None`` is open."""
+        start = 0 if low is None else self.values.searchsorted(self._bound(low), "left")
+        end = (
+            len(self.values)
+            if high is None
+            else self.values.searchsorted(self._bound(high), "right")
+        )
+        rows = np.sort(self.order[start:end])
+        if len(self.patched):
+            rows = self._patched(rows, between_mask(self.current, low, high))
+        return rows
+
+
+INDEXES: Dict[str, type[ColumnIndex]] = {"hash": HashIndex, "sorted": SortedIndex}
+
+
+def index_key(cols: List[str], kind: str) -> Tuple[str, Tuple[str, ...]]:
+    if kind not in INDEXES:
+        raise ValueError(f"Unknown index kind {kind}, use one of {list(INDEXES)}")
+    return kind, tuple(cols)
+
+
+def sort_ranks(df: pd.DataFrame, cols: List[str]) -> np.ndarray:
+    """Rank of each row of ``df`` in ascending order of ``cols``.
+
+    Missing values sort last and rows equal on ``cols`` share a rank, so
+    ranks order rows as ``df.sort_values(cols)`` does.
+    """
+    ranks, span = np.zeros(len(df), dtype=np.int64), 1
+    for col in cols:
+        codes, uniques = pd.factorize(df[col], sort=True)
+        width = len(uniques) + 1
+        if span * width >= 2**63:
+            ranks = np.unique(ranks, return_inverse=True)[1].reshape(-1)
+            span = int(ranks.max(initial=0)) + 1
+        ranks = ranks * width + np.where(codes < 0, len(uniques), codes)
+        span *= width
+    return ranks
+
+
+def top_positions(ranks: np.ndarray, limit: int, offset: int = 0) -> np.ndarray:
+    """Positions of the rows ranked ``offset`` to ``offset + limit``, in order.
+
+    Only the first ``offset + limit`` rows are selected and sorted; ties keep
+    row order, as a stable sort would.
+    """
+    end = min(offset + limit, len(ranks))
+    if offset >= end:
+        return np.array([], dtype=np.intp)
+    if end < len(ranks):
+        last = np.partition(ranks, end - 1)[end - 1]
+        below = np.flatnonzero(ranks < last)
+        ties = np.flatnonzero(ranks == last)[: end - len(below)]
+        chosen = np.concatenate([below, ties])
+    else:
+        chosen = np.arange(len(ranks))
+    return chosen[np.lexsort((chosen, ranks[chosen]))][offset:end]
+
+
+MATCH_OPERATORS = {"in": "hash", "between": "sorted", "regex": ""}
+
+
+def match_fields(conditions: Dict[str, Any]) -> Set[str]:
+    """Fields tested by ``conditions``, see :func:`match_positions`."""
+    fields: Set[str] = set()
+    for field, cond in conditions.items():
+        if field in ("and", "or"):
+            for part in cond:
+                fields |= match_fields(part)
+        elif field == "not":
+            fields |= match_fields(cond)
+        else:
+            fields.add(xlate(field)[0])
+    return fields
+
+
+def match_positions(
+    df: pd.DataFrame,
+    conditions: Dict[str, Any],
+    lookup: Optional[Callable[[List[str], str], Any]] = None,
+) -> np.ndarray:
+    """Sorted positions of the rows of ``df`` meeting ``conditions``.
+
+    See :meth:`DS.match`. ``lookup(cols, kind)`` returns a secondary index to
+    answer a condition from, or ``None`` to scan the column.
+    """
+    positions: Optional[np.ndarray] = None
+    for field, cond in conditions.items():
+        if field == "and":
+            found = np.arange(len(df))
+            for part in cond:
+                found = np.intersect1d(
+                    found, match_positions(df, part, lookup), assume_unique=True
+                )
+        elif field == "or":
+            found = np.unique(
+                np.concatenate(
+                    [match_positions(df, alt, lookup) for alt in cond] or [[]]
+                )
+            ).astype(np.intp)
+        elif field == "not":
+            found = np.setdiff1d(
+                np.arange(len(df)),
+                match_positions(df, cond, lookup),
+                assume_unique=True,
+            )
+        else:
+            col = xlate(field)[0]
+            if col not in df.columns:
+                raise ValueError(f"Field {field} not found in dataset")
+            found = _match_field(df[col], cond, lookup)
+        positions = (
+            found
+            if positions is None
+            else np.intersect1d(positions, found, assume_unique=True)
+        )
+    return np.arange(len(df)) if positions is None else positions
+
+
+def between_mask(values: pd.Series, low: Any, high: Any) -> pd.Series:
+    """Whether each of ``values`` is within ``low`` and ``high``; ``None`` is open."""
+    mask = values.notna()
+    if low is not None:
+        mask &= values >= low
+    if high is not None:
+        mask &= values <= high
+    return mask
+
+
+def _match_field(
+    values: pd.Series,
+    cond: Any,
+    lookup: Optional[Callable[[List[str], str], Any]],
+) -> np.ndarray:
+    if not isinstance(cond, dict):
+        cond = {"in": cond if isinstance(cond, (list, tuple, set)) else [cond]}
+    if len(cond) != 1:
+        raise ValueError(f"Expected one operator for {values.name}, got {list(cond)}")
+    op, arg = next(iter(cond.items()))
+    if op not in MATCH_OPERATORS:
+        raise ValueError(f"Unknown operator {op}, use one of {MATCH_OPERATORS}")
+    kind = MATCH_OPERATORS[op]
+    index = lookup([str(values.name)], kind) if lookup and kind else None
+    if op == "in":
+        found = None if index is None else index.positions(arg)
+        if found is not None:
+            return found
+        mask = values.isin(list(arg))
+    elif op == "between":
+        low, high = arg
+        if index is not None:
+            return index.between(low, high)
+        mask = between_mask(values, low, high)
+    else:
+        mask = values.astype(str).str.contains(arg, regex=True)
+    return np.flatnonzero(mask.to_numpy(dtype=bool, na_value=False))
@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+from collections.abc import Hashable, Iterator, MutableMapping
+from typing import TYPE_CHECKING, Any, Dict
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+    from .ds import DS
+
+
+class KV(MutableMapping[Hashable, Dict[str, Any]]):
+    """Lazy ``key -> row`` mapping over the keyed frame of a DS.
+
+    Rows are materialized from ``ds.df`` on access and the most recently used
+    ``maxsize`` of them are kept in a small LRU; ``maxsize=0`` disables it.
+    """
+
+    def __init__(self, ds: DS, maxsize: int = 256) -> None:
+        self._ds = ds
+        self.maxsize = maxsize
+        self._rows: OrderedDict[Hashable, Dict[str, Any]] = OrderedDict()
+
+    @property
+    def df(self) -> pd.DataFrame:
+        return self._ds.df
+
+    def __getitem__(self, key: Hashable) -> Dict[str, Any]:
+        row = self._rows.get(key)
+        if row is not None:
+            self._rows.move_to_end(key)
+            return row
+        loc = self.df.index.get_loc(key)
+        if not isinstance(loc, int):
+            raise KeyError(f"Key {key} is not unique")
+        row = self.df.iloc[loc].to_dict()
+        if self.maxsize > 0:
+            self._rows[key] = row
+            if len(self._rows) > self.maxsize:
+                self._rows.popitem(last=False)
+        return row
+
+    def __setitem__(self, key: Hashable, value: Dict[str, Any]) -> None:
+        self._ds.update_many({key: value})
+
+    def __delitem__(self, key: Hashable) -> None:
+        if key not in self.df.index:
+            raise KeyError(key)
+        self._ds.df = self.df.drop(index=key)
+        self._ds._dropped([key])
+
+    def __iter__(self) -> Iterator[Hashable]:
+        return iter(self.df.index)
+
+    def __len__(self) -> int:
+        return len(self.df.index)
+
+    def __contains__(self, key: object) -> bool:
+        try:
+            return key in self.df.index
+        except TypeError:
+            return False
+
+    def invalidate(self, *keys: Hashable) -> None:
+        """Forget cached rows for ``keys``, or every cached row if none given."""
+        if not keys:
+            self._rows.clear()
+        for key in keys:
+            self._rows.pop(key, None)
+
+    def __repr__(self) -> str:
+        return f"KV(rows={len(self)}, cached={len(self._rows)})"
@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+
+from .ds import DS
+from .reader import CHUNKSIZE, Reader
+from .utils import xlate
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+    from .ntypes import SourceTypeVar, StrLStrTypeVar
+
+
+class LazyDS:
+    """Deferred DS over ``source``.
+
+    :meth:`select` and :meth:`match` only add to a plan of columns and row
+    conditions, which is pushed into :meth:`Reader.read` when the data is
+    first needed through :attr:`df` or :meth:`collect`. Key fields and child
+    columns are always read. ``kwargs`` are passed to the reader.
+    """
+
+    def __init__(
+        self,
+        source: SourceTypeVar,
+        keys: StrLStrTypeVar = None,
+        children: Optional[Dict[str, Any]] = None,
+        columns: Optional[List[str]] = None,
+        where: Optional[Dict[str, Any]] = None,
+        dtypes: Optional[Dict[str, Any]] = None,
+        chunksize: int = CHUNKSIZE,
+        **kwargs: Any,
+    ):
+        if isinstance(keys, str):
+            keys = keys.split(",")
+        self.source = source
+        self.keys: List[str] = list(keys or [])
+        self.children = children or {}
+        self.columns = columns
+        self.where = where or {}
+        self.dtypes = dtypes or {}
+        self.chunksize = chunksize
+        self.kwargs = kwargs
+        self._ds: Optional[DS] = None
+
+    def _derive(self, **changes: Any) -> LazyDS:
+        spec = {
+            "keys": self.keys,
+            "children": self.children,
+            "columns": self.columns,
+            "where": self.where,
+            "dtypes": self.dtypes,
+            "chunksize": self.chunksize,
+        }
+        return LazyDS(self.source, **{**spec, **changes}, **self.kwargs)
+
+    def select(self, cols: StrLStrTypeVar) -> LazyDS:
+        """Plan reading only ``cols``, within any earlier selection."""
+        if isinstance(cols, str):
+            cols = cols.split(",")
+        wanted = [xlate(col)[0] for col in cols or []]
+        if self.columns is not None:
+            wanted = [col for col in wanted if col in self.columns]
+        return self._derive(columns=wanted)
+
+    def match(self, conditions: Dict[str, Any]) -> LazyDS:
+        """Plan reading only the rows meeting ``conditions``, see DS.match."""
+        if not self.where:
+            return self._derive(where=dict(conditions))
+        return self._derive(where={"and": [self.where, dict(conditions)]})
+
+    def astype(self, dtypes: Dict[str, Any]) -> LazyDS:
+        """Plan parsing fields as ``dtypes``, e.g. ``category`` for labels."""
+        return self._derive(dtypes={**self.dtypes, **dtypes})
+
+    @property
+    def plan(self) -> Dict[str, Any]:
+        columns = self.columns
+        if columns is not None:
+            extra = [xlate(col)[0] for col in [*self.keys, *self.children]]
+            columns = list(dict.fromkeys([*extra, *columns]))
+        return {"columns": columns, "where": self.where, "dtypes": self.dtypes}
+
+    def collect(self) -> DS:
+        """Read the planned columns and rows and build the DS, once."""
+        if self._ds is None:
+            reader = Reader(**self.kwargs)
+            protocol, df = reader.read(
+                self.source, chunksize=self.chunksize, **self.plan
+            )
+            self._ds = DS(df, keys=self.keys, children=self.children, copy=False)
+            self._ds.protocol = protocol
+        return self._ds
+
+    @property
+    def df(self) -> pd.DataFrame:
+        return self.collect().df
+
+    def __repr__(self) -> str:
+        state = "collected" if self._ds is not None else "pending"
+        return f"LazyDS({state}, plan={self.plan})"
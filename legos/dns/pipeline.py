@@ -0,0 +1,362 @@
+from __future__ import annotations
+
+import re
+import time
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Set, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from .ds import DS
+from .index import match_fields, match_positions
+from .lazy import LazyDS
+from .utils import df_keys, read_yaml, xlate
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterable
+
+Stage = Tuple[str, Any]
+
+STAGES = (
+    "project",
+    "match",
+    "group",
+    "sort",
+    "melt",
+    "unmelt",
+    "append",
+    "delete",
+    "update",
+    "math",
+)
+
+
+def _fields(names: Any) -> List[str]:
+    if isinstance(names, str):
+        names = names.split(",")
+    return [xlate(name.strip())[0] for name in names]
+
+
+def _group_spec(arg: Dict[str, Any]) -> Dict[str, Any]:
+    aggs = {}
+    for out, agg in (arg.get("aggs") or {}).items():
+        col, func = (out, agg) if isinstance(agg, str) else agg
+        aggs[xlate(out)[0]] = (xlate(col)[0], func)
+    return {"by": _fields(arg["by"]), "aggs": aggs}
+
+
+def _sort_spec(arg: Any) -> Dict[str, Any]:
+    if isinstance(arg, dict):
+        return {"by": _fields(arg["by"]), "ascending": arg.get("ascending", True)}
+    names = arg.split(",") if isinstance(arg, str) else arg
+    return {
+        "by": _fields([name.strip().lstrip("-") for name in names]),
+        "ascending": [not name.strip().startswith("-") for name in names],
+    }
+
+
+def _melt_spec(arg: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "id": _fields(arg.get("id", [])),
+        "values": _fields(arg["values"]) if arg.get("values") else None,
+        "var": arg.get("var", "field"),
+        "value": arg.get("value", "value"),
+    }
+
+
+def _unmelt_spec(arg: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "index": _fields(arg["index"]),
+        "columns": xlate(arg["columns"])[0],
+        "values": xlate(arg["values"])[0],
+        "aggfunc": arg.get("aggfunc", "first"),
+    }
+
+
+def _update_spec(arg: Dict[str, Any]) -> Dict[str, Any]:
+    sets = {xlate(col)[0]: val for col, val in arg["set"].items()}
+    return {"match": arg.get("match") or {}, "set": sets}
+
+
+STAGE_SPECS: Dict[str, Callable[[Any], Any]] = {
+    "project": _fields,
+    "group": _group_spec,
+    "sort": _sort_spec,
+    "melt": _melt_spec,
+    "unmelt": _unmelt_spec,
+    "update": _update_spec,
+    "math": lambda arg: {xlate(col)[0]: expr for col, expr in arg.items()},
+}
+
+
+def _can_precede(stage: Stage, prev: Stage) -> bool:
+    """Whether ``stage`` gives the same result when run before ``prev``."""
+    op, arg = stage
+    pop, parg = prev
+    if op == "match":
+        fields = match_fields(arg)
+        if pop == "sort":
+            return True
+        if pop == "group":
+            return fields <= set(parg["by"])
+        if pop == "project":
+            return fields <= set(parg)
+        if pop == "math":
+            return not fields & set(parg)
+    if op == "project" and pop == "sort":
+        return set(parg["by"]) <= set(arg)
+    return False
+
+
+def plan(stages: List[Stage]) -> List[Stage]:
+    """Reorder ``stages`` so that ``match`` and ``project`` run early.
+
+    Filters move ahead of sorts, projections, computed columns and groups
+    (when they only test group fields), projections ahead of sorts on
+    projected fields, and adjacent filters on distinct fields are merged so
+    that a leading filter can be answered from the dataset's indexes.
+    """
+    planned: List[Stage] = []
+    for stage in stages:
+        pos = len(planned)
+        while pos and _can_precede(stage, planned[pos - 1]):
+            pos -= 1
+        planned.insert(pos, stage)
+
+    merged: List[Stage] = []
+    for op, arg in planned:
+        if (
+            merged
+            and op == "match" == merged[-1][0]
+            and not set(arg) & set(merged[-1][1])
+        ):
+            merged[-1] = (op, {**merged[-1][1], **arg})
+        else:
+            merged.append((op, arg))
+    return merged
+
+
+class Pipeline:
+    """Declarative ``core/pipeline.yaml`` stages executed over a DS.
+
+    ``stages`` is a list of single key ``{stage: spec}`` maps (or one map
+    with the stages in order). Stages are ``project`` (fields), ``match`` and
+    ``delete`` (conditions of :meth:`DS.match`), ``group`` (``by`` fields and
+    ``aggs`` of ``out: func`` or ``out: [field, func]``), ``sort`` (fields,
+    ``-field`` for descending), ``melt``/``unmelt``, ``append`` (a source),
+    ``update`` (``match`` conditions and values to ``set``) and ``math``
+    (``field: expression`` for ``DataFrame.eval``). With ``optimize`` the
+    stages are reordered by :func:`plan` first.
+    """
+
+    def __init__(self, stages: Any, optimize: bool = True):
+        if isinstance(stages, dict):
+            stages = [{op: arg} for op, arg in stages.items()]
+        parsed: List[Stage] = []
+        for stage in stages:
+            if len(stage) != 1:
+                raise ValueError(f"Expected one operation per stage, got {list(stage)}")
+            op, arg = next(iter(stage.items()))
+            if op not in STAGES:
+                raise ValueError(f"Unknown stage {op}, use one of {STAGES}")
+            if arg is not None:
+                parsed.append((op, STAGE_SPECS.get(op, lambda x: x)(arg)))
+        self.stages = parsed
+        self.plan = plan(parsed) if optimize else parsed
+        self.timings: Dict[str, float] = {}
+
+    @classmethod
+    def from_spec(cls, spec: Dict[str, Any], **kwargs: Any) -> Pipeline:
+        """Pipeline of a ``pipeline`` block or of a ``core/query.yaml`` query."""
+        if "q" in spec or "aggr" in spec:
+            stages = [
+                {"match": spec.get("q")},
+                {"group": spec.get("aggr")},
+                {"sort": spec.get("sort")},
+            ]
+            return cls(stages, **kwargs)
+        return cls(spec.get("pipeline", spec), **kwargs)
+
+    @classmethod
+    def from_yaml(cls, path: str, **kwargs: Any) -> Pipeline:
+        spec = read_yaml(path)
+        if spec is None:
+            raise ValueError(f"Could not read pipeline {path}")
+        return cls.from_spec(spec, **kwargs)
+
+    def run(self, ds: Union[DS, LazyDS]) -> DS:
+        """Run the planned stages over ``ds``.
+
+        A :class:`LazyDS` is read with the leading filters and the fields
+        used by the pipeline pushed into its reader.
+        """
+        stages = self.plan
+        if isinstance(ds, LazyDS):
+            ds, stages = self._pushdown(ds)
+        df, keys = ds.df, ds.keys
+        at_source, owned = True, False
+        self.timings = {}
+        for i, (op, arg) in enumerate(stages):
+            start = time.perf_counter()
+            lookup = ds._index if at_source else None
+            if op in ("update", "math") and not owned:
+                df = df.copy()
+            df, keys = STAGE_RUNNERS[op](df, keys, arg, lookup)
+            at_source, owned = False, True
+            self.timings[f"{i}:{op}"] = time.perf_counter() - start
+        if not owned:
+            df = df.copy(deep=False)
+        return DS._from_keyed(df, {"keys": keys, "protocol": "pipeline"})
+
+    def _pushdown(self, lazy: LazyDS) -> Tuple[DS, List[Stage]]:
+        stages = self.plan
+        while stages and stages[0][0] == "match":
+            lazy = lazy.match(stages[0][1])
+            stages = stages[1:]
+        fields = source_fields(stages)
+        if fields is not None:
+            lazy = lazy.select(fields)
+        return lazy.collect(), stages
+
+
+def source_fields(stages: List[Stage]) -> Optional[List[str]]:
+    """Source fields ``stages`` read, or ``None`` when they may read any."""
+    needed: List[str] = []
+    made: Set[str] = set()
+
+    def need(fields: Iterable[str]) -> List[str]:
+        needed.extend(field for field in fields if field not in made)
+        return list(dict.fromkeys(needed))
+
+    for op, arg in stages:
+        if op in ("match", "delete"):
+            need(match_fields(arg))
+        elif op == "sort":
+            need(arg["by"])
+        elif op == "update":
+            need(match_fields(arg["match"]))
+            made.update(arg["set"])
+        elif op == "math":
+            for col, expr in arg.items():
+                need(xlate(m.group(1) or m.group(2))[0] for m in _NAME.finditer(expr))
+                made.add(col)
+        elif op == "project":
+            return need(arg)
+        elif op == "group":
+            return need([*arg["by"], *(col for col, _ in arg["aggs"].values())])
+        elif op == "unmelt":
+            return need([*arg["index"], arg["columns"], arg["values"]])
+        elif op == "melt" and arg["values"] is not None:
+            return need([*arg["id"], *arg["values"]])
+        else:
+            return None
+    return None
+
+
+def _match(df: pd.DataFrame, keys: List[str], arg: Any, lookup: Any) -> Any:
+    return df.take(match_positions(df, arg, lookup)), keys
+
+
+def _delete(df: pd.DataFrame, keys: List[str], arg: Any, lookup: Any) -> Any:
+    keep = np.ones(len(df), dtype=bool)
+    keep[match_positions(df, arg, lookup)] = False
+    return df[keep], keys
+
+
+def _project(df: pd.DataFrame, keys: List[str], arg: Any, lookup: Any) -> Any:
+    missing = set(arg) - set(df.columns)
+    if missing:
+        raise ValueError(f"Unknown fields {missing}")
+    return df[arg], keys
+
+
+def _group(df: pd.DataFrame, keys: List[str], arg: Any, lookup: Any) -> Any:
+    by, aggs = arg["by"], arg["aggs"]
+    used = list(dict.fromkeys([*by, *(col for col, _ in aggs.values())]))
+    grouped = df[used].groupby(by, observed=True, dropna=False)
+    if aggs:
+        out = grouped.agg(**{name: pd.NamedAgg(*agg) for name, agg in aggs.items()})
+    else:
+        out = grouped.size().to_frame("count")
+    out = out.reset_index()
+    out.index = df_keys(out, by)
+    return out, by
+
+
+def _sort(df: pd.DataFrame, keys: List[str], arg: Any, lookup: Any) -> Any:
+    return df.sort_values(arg["by"], ascending=arg["ascending"], kind="stable"), keys
+
+
+def _melt(df: pd.DataFrame, keys: List[str], arg: Any, lookup: Any) -> Any:
+    ids = arg["id"]
+    if keys:
+        df, ids = df.reset_index(), ["key", *ids]
+    out = df.melt(
+        id_vars=ids,
+        value_vars=arg["values"],
+        var_name=arg["var"],
+        value_name=arg["value"],
+    )
+    return out, []
+
+
+def _unmelt(df: pd.DataFrame, keys: List[str], arg: Any, lookup: Any) -> Any:
+    out = df.pivot_table(
+        index=arg["index"],
+        columns=arg["columns"],
+        values=arg["values"],
+        aggfunc=arg["aggfunc"],
+        observed=True,
+        sort=False,
+    )
+    out.columns.name = None
+    return out.reset_index(), []
+
+
+def _append(df: pd.DataFrame, keys: List[str], arg: Any, lookup: Any) -> Any:
+    other = arg if isinstance(arg, DS) else DS(arg, keys=keys)
+    out = pd.concat([df, other.df], ignore_index=not keys)
+    if keys and not out.index.is_unique:
+        raise ValueError("Appended rows repeat existing keys")
+    return out, keys
+
+
+def _update(df: pd.DataFrame, keys: List[str], arg: Any, lookup: Any) -> Any:
+    rows = np.zeros(len(df), dtype=bool)
+    rows[match_positions(df, arg["match"], lookup)] = True
+    for col, val in arg["set"].items():
+        df.loc[rows, col] = val
+    return df, keys
+
+
+_NAME = re.compile(r"`([^`]+)`|\b([A-Za-z_]\w*)\b")
+
+
+def _expr(expr: str, columns: pd.Index) -> str:
+    def field(found: re.Match[str]) -> str:
+        var = xlate(found.group(1) or found.group(2))[0]
+        return var if var in columns else found.group(0)
+
+    return _NAME.sub(field, expr)
+
+
+def _math(df: pd.DataFrame, keys: List[str], arg: Any, lookup: Any) -> Any:
+    for col, expr in arg.items():
+        df[col] = df.eval(_expr(expr, df.columns))
+    return df, keys
+
+
+STAGE_RUNNERS: Dict[
+    str, Callable[[pd.DataFrame, List[str], Any, Optional[Any]], Any]
+] = {
+    "match": _match,
+    "delete": _delete,
+    "project": _project,
+    "group": _group,
+    "sort": _sort,
+    "melt": _melt,
+    "unmelt": _unmelt,
+    "append": _append,
+    "update": _update,
+    "math": _math,
+}
@@ -1,29 +1,141 @@
+import hashlib
+import importlib.util
 import io
+import json
+import os
 import re
-from typing import Any, Callable, Dict, Type
+from contextlib import closing
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Type
 
 import number_parser
 import pandas as pd  # type: ignore[import]
 
+from .index import match_fields, match_positions
+from .utils import xlate
+
 DataFrameReader = Callable[[Any], pd.DataFrame]
 DictReader = Callable[[Dict[str, Any]], pd.DataFrame]
+ChunkReader = Callable[..., Iterable[pd.DataFrame]]
+
+CHUNKSIZE = 100_000
+
+HAS_PARQUET = importlib.util.find_spec("pyarrow") is not None
+CACHE_ENABLED = os.environ.get("DNS_CACHE", "1").lower() not in ("0", "false", "no")
+CACHE_DIR = os.environ.get("DNS_CACHE_DIR", str(Path.home() / ".cache" / "dns"))
+CACHE_SIZE = 2 * 2**30
+CACHED_PARSERS = ("csv", "sheet", "json", "jsonl", "xls")
+PUSHDOWN_PARSERS = ("str", "bytes", "csv")
+
+
+class SourceCache:
+    """Read-through Parquet cache of parsed file sources.
+
+    Entries are keyed by path, mtime, size, parser and reader kwargs, so an
+    edited file or different read options never hit a stale entry. Least
+    recently used entries are evicted once the directory exceeds ``max_bytes``.
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None, max_bytes: int = CACHE_SIZE):
+        self.cache_dir = Path(cache_dir or CACHE_DIR)
+        self.max_bytes = max_bytes
+
+    def path(self, parser: str, source: str, kwargs: Dict[str, Any]) -> Optional[Path]:
+        try:
+            stat = os.stat(source)
+        except (OSError, TypeError, ValueError):
+            return None
+        fingerprint = json.dumps(
+            [
+                os.path.abspath(source),
+                stat.st_mtime_ns,
+                stat.st_size,
+                parser,
+                sorted((k, repr(v)) for k, v in kwargs.items()),
+            ]
+        )
+        digest = hashlib.sha256(fingerprint.encode()).hexdigest()
+        return self.cache_dir / f"{digest}.parquet"
+
+    def get(self, path: Path) -> Optional[pd.DataFrame]:
+        if not path.exists():
+            return None
+        try:
+            df = pd.read_parquet(path)
+        except Exception as e:
+            print(f"Error: Dropping unreadable cache entry {path}: {e}")
+            path.unlink(missing_ok=True)
+            return None
+        path.touch()
+        return df
+
+    def put(self, path: Path, df: pd.DataFrame) -> None:
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        try:
+            df.to_parquet(tmp)
+            os.replace(tmp, path)
+        except Exception as e:
+            print(f"Error: Could not cache {path.name}: {e}")
+            tmp.unlink(missing_ok=True)
+            return
+        self.evict()
+
+    def evict(self) -> None:
+        evict_files(self.cache_dir, "*.parquet", self.max_bytes)
+
+
+def evict_files(folder: Path, pattern: str, max_bytes: int) -> None:
+    """Delete the least recently touched ``pattern`` files over ``max_bytes``."""
+    entries = []
+    for entry in folder.glob(pattern):
+        stat = entry.stat()
+        entries.append((stat.st_mtime, stat.st_size, entry))
+    entries.sort()
+    total = sum(size for _, size, _ in entries)
+    for _, size, entry in entries:
+        if total <= max_bytes:
+            break
+        entry.unlink(missing_ok=True)
+        total -= size
 
 
 class Reader:
-    def __init__(self, **kwargs: Any) -> None:
+    def __init__(
+        self,
+        copy: bool = True,
+        cache: bool = CACHE_ENABLED,
+        cache_dir: Optional[str] = None,
+        cache_size: int = CACHE_SIZE,
+        **kwargs: Any,
+    ) -> None:
+        self.kwargs = kwargs
+        self.cache: Optional[SourceCache] = (
+            SourceCache(cache_dir, cache_size) if cache and HAS_PARQUET else None
+        )
         self.readers: Dict[str, DataFrameReader] = {  # ignore
-            "pd": lambda x: x.copy(),
+            "pd": lambda x: x.copy() if copy else x,
             "dict": lambda x: pd.DataFrame.from_dict(x, orient="columns"),  # type: ignore  # noqa: PGH003
             "str": lambda x: pd.read_csv(io.StringIO(x)),  # type: ignore  # noqa: PGH003
             "bytes": lambda x: pd.read_csv(io.BytesIO(x)),  # type: ignore  # noqa: PGH003
             "csv": lambda x: pd.read_csv(x, **kwargs),  # type: ignore  # noqa: PGH003
             "sheet": lambda x: pd.read_excel(x, **kwargs),  # type: ignore  # noqa: PGH003
             "json": lambda x: pd.read_json(x, **kwargs),  # type: ignore  # noqa: PGH003
+            "jsonl": lambda x: pd.read_json(x, **{**kwargs, "lines": True}),  # type: ignore  # noqa: PGH003
             "xls": lambda x: pd.read_excel(x, **kwargs),  # type: ignore  # noqa: PGH003
             # "qzt": lambda x: self._qz_to_df(x, **kwargs),
             # "txf": lambda x: self._txf_to_df(x, **kwargs),
             # "http": lambda x: self._txf_to_df(x, **kwargs),
         }
+        self.chunkers: Dict[str, ChunkReader] = {
+            "str": lambda x, n, **kw: pd.read_csv(io.StringIO(x), chunksize=n, **kw),  # type: ignore  # noqa: PGH003
+            "bytes": lambda x, n, **kw: pd.read_csv(io.BytesIO(x), chunksize=n, **kw),  # type: ignore  # noqa: PGH003
+            "csv": lambda x, n, **kw: pd.read_csv(x, chunksize=n, **kwargs, **kw),  # type: ignore  # noqa: PGH003
+            "json": lambda x, n, **kw: pd.read_json(x, chunksize=n, **kwargs, **kw),  # type: ignore  # noqa: PGH003
+            "jsonl": lambda x, n, **kw: pd.read_json(  # type: ignore  # noqa: PGH003
+                x, chunksize=n, **{**kwargs, "lines": True}, **kw
+            ),
+        }
         self.dtypes: Dict[Any, str] = {
             pd.DataFrame: "pd",
             dict: "dict",
@@ -32,11 +144,7 @@ class Reader:
         }
 
     def _infer_parser(self, data: Any) -> tuple[str, Callable[[Any], pd.DataFrame]]:
-        for dtype, parser in self.dtypes.items():
-            if isinstance(data, dtype):
-                return parser, self.readers[parser]
-
-        if isinstance(data, str):
+        if isinstance(data, str) and "\n" not in data:
             uri, _ = data.split("://", 1) if "://" in data else ("", data)
             if uri in self.readers:
                 return uri, self.readers[uri]
@@ -46,8 +154,179 @@ class Reader:
             if match and match.group(1) in self.readers:
                 return match.group(1), self.readers[match.group(1)]
 
+        for dtype, parser in self.dtypes.items():
+            if isinstance(data, dtype):
+                return parser, self.readers[parser]
+
         raise ValueError(f"Unsupported data type: {type(data)}")
 
     def to_df(self, data: Any) -> tuple[str, pd.DataFrame]:
         parser, reader = self._infer_parser(data)
-        return parser, reader(data)
+        cached = self._cached(parser, data)
+        if cached is not None:
+            df = self.cache.get(cached)  # type: ignore  # noqa: PGH003
+            if df is not None:
+                return parser, df
+        df = reader(data)
+        if cached is not None:
+            self.cache.put(cached, df)  # type: ignore  # noqa: PGH003
+        return parser, df
+
+    def _cached(self, parser: str, data: Any) -> Optional[Path]:
+        if self.cache is None or parser not in CACHED_PARSERS:
+            return None
+        return self.cache.path(parser, data, self.kwargs)
+
+    def _chunker(self, parser: str) -> Optional[ChunkReader]:
+        """Chunk reader of ``parser``; json streams only as json lines."""
+        if parser == "json" and not self.kwargs.get("lines"):
+            return None
+        return self.chunkers.get(parser)
+
+    def iter_chunks(
+        self, data: Any, chunksize: int = CHUNKSIZE
+    ) -> Iterator[pd.DataFrame]:
+        """Yield ``data`` as frames of at most ``chunksize`` rows.
+
+        csv, json lines (``.jsonl`` or ``lines=True``), str and bytes sources
+        are streamed; other sources are read whole and yielded as one chunk.
+        """
+        parser, reader = self._infer_parser(data)
+        chunker = self._chunker(parser)
+        if chunker is None:
+            yield reader(data)
+            return
+        with closing(chunker(data, chunksize)) as chunks:  # type: ignore  # noqa: PGH003
+            yield from chunks
+
+    def read(
+        self,
+        data: Any,
+        columns: Optional[Iterable[str]] = None,
+        where: Optional[Dict[str, Any]] = None,
+        dtypes: Optional[Dict[str, Any]] = None,
+        chunksize: int = CHUNKSIZE,
+    ) -> tuple[str, pd.DataFrame]:
+        """Read only the ``columns`` and the rows meeting ``where`` of ``data``.
+
+        Names are matched, and returned, in their xlated form and ``where``
+        takes the conditions of :func:`match_positions`. A cached source is
+        read from its Parquet entry with the columns and the ``in``/``between``
+        filters pushed into the Parquet reader. csv, str and bytes sources are
+        parsed chunk by chunk with ``usecols`` and ``dtypes`` given to the
+        parser and the rows filtered per chunk; json lines are streamed and
+        filtered the same way. Other sources are read whole through
+        :meth:`to_df`, which fills the cache for the next read.
+        """
+        where = where or {}
+        keep = None if columns is None else [xlate(col)[0] for col in columns]
+        wanted = None if keep is None else set(keep) | match_fields(where)
+        dtypes = {xlate(col)[0]: dtype for col, dtype in (dtypes or {}).items()}
+        parser, reader = self._infer_parser(data)
+
+        cached = self._cached(parser, data)
+        chunker = self._chunker(parser)
+        if cached is not None and cached.exists():
+            parts = [self._read_cached(cached, wanted, where)]
+        elif chunker is not None:
+            kw: Dict[str, Any] = {}
+            if parser in PUSHDOWN_PARSERS:
+                if wanted is not None:
+                    kw["usecols"] = lambda col: xlate(col)[0] in wanted
+                if dtypes:
+                    kw["dtype"] = self._source_dtypes(chunker, data, dtypes)
+            with closing(chunker(data, chunksize, **kw)) as chunks:  # type: ignore  # noqa: PGH003
+                parts = [_pushdown(chunk, wanted, where) for chunk in chunks]
+        else:
+            parts = [_pushdown(self.to_df(data)[1], wanted, where)]
+
+        df = pd.concat(parts, ignore_index=True) if len(parts) > 1 else parts[0]
+        if keep is not None:
+            df = df[[col for col in df.columns if col in keep]]
+        todo = {col: dtype for col, dtype in dtypes.items() if col in df.columns}
+        if todo and any(str(df[col].dtype) != str(dt) for col, dt in todo.items()):
+            df = df.astype(todo)
+        return parser, df
+
+    def _source_dtypes(
+        self, chunker: ChunkReader, data: Any, dtypes: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        with closing(chunker(data, 1, nrows=1)) as chunks:  # type: ignore  # noqa: PGH003
+            head = next(iter(chunks))
+        return {
+            col: dtypes[xlate(col)[0]]
+            for col in head.columns
+            if xlate(col)[0] in dtypes
+        }
+
+    def _read_cached(
+        self, path: Path, wanted: Optional[set[str]], where: Dict[str, Any]
+    ) -> pd.DataFrame:
+        import pyarrow.parquet as pq
+
+        schema = pq.read_schema(path)
+        names = {xlate(name)[0]: name for name in schema.names}
+        columns = None
+        if wanted is not None:
+            columns = [name for var, name in names.items() if var in wanted]
+        filters = []
+        for field, cond in where.items():
+            name = names.get(xlate(field)[0])
+            if name is None or field in ("and", "or", "not"):
+                continue
+            op, arg = next(iter(_condition(cond).items()))
+            if op not in ("in", "between"):
+                continue
+            values = _arrow_values(list(arg), schema.field(name).type)
+            if values is None or (op == "in" and None in values):
+                continue
+            if op == "in":
+                filters.append((name, "in", values))
+            else:
+                low, high = values
+                if low is not None:
+                    filters.append((name, ">=", low))
+                if high is not None:
+                    filters.append((name, "<=", high))
+        df = pd.read_parquet(path, columns=columns, filters=filters or None)
+        path.touch()
+        return _pushdown(df, None, where)
+
+
+def _arrow_values(values: List[Any], arrow_type: Any) -> Optional[List[Any]]:
+    """``values`` as comparable to a Parquet field of ``arrow_type``, or None.
+
+    Strings are read as timestamps for temporal fields, as pandas compares
+    them; values of another type are not pushed down and are left to the
+    scan of the read rows.
+    """
+    import pyarrow as pa
+
+    temporal = pa.types.is_temporal(arrow_type)
+    out = []
+    for value in values:
+        try:
+            cast = pd.Timestamp(value) if temporal and isinstance(value, str) else value
+            if cast is not None:
+                pa.scalar(cast, type=arrow_type)
+        except (ValueError, TypeError, pa.ArrowException):
+            return None
+        out.append(cast)
+    return out
+
+
+def _condition(cond: Any) -> Dict[str, Any]:
+    if isinstance(cond, dict):
+        return cond
+    return {"in": cond if isinstance(cond, (list, tuple, set)) else [cond]}
+
+
+def _pushdown(
+    df: pd.DataFrame, wanted: Optional[set[str]], where: Dict[str, Any]
+) -> pd.DataFrame:
+    df.columns = [xlate(col)[0] for col in df.columns]
+    if wanted is not None:
+        df = df[[col for col in df.columns if col in wanted]]
+    if where:
+        df = df.take(match_positions(df, where))
+    return df
@@ -0,0 +1,182 @@
+from __future__ import annotations
+
+import html
+import uuid
+from typing import TYPE_CHECKING, Any, List, Optional
+
+import numpy as np
+import seaborn as sns
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+GRADIENT_STEPS = 64
+
+TABLE_STYLE = """
+#{id} {{ padding: 0.5em; border-collapse: collapse; }}
+#{id} td {{ font-family: arial, sans-serif; background-color: white;
+  font-size: medium; text-align: right; width: auto; padding: 0.3em;
+  color: black; }}
+#{id} tr {{ padding: 0.5em; }}
+#{id} th {{ font-style: italic; color: black; font-size: 110%;
+  font-weight: bold; padding: 0.5em; text-align: right; }}
+#{id} th.index_name {{ text-align: left; }}
+#{id} td.neg {{ color: red; }}
+#{id} td.na {{ background-color: transparent; }}
+"""
+
+
+def gradient_steps(df: pd.DataFrame) -> np.ndarray:
+    """Gradient step per cell of ``df``, -1 for cells without a colour.
+
+    Numeric columns are scaled from their minimum to their maximum into
+    ``GRADIENT_STEPS`` steps, as ``Styler.background_gradient(axis=0)``
+    colours them; other columns and missing values get no step.
+    """
+    steps = np.full(df.shape, -1, dtype=np.int16)
+    for i, (_, col) in enumerate(df.items()):
+        if col.dtype.kind not in "iuf":
+            continue
+        values = col.to_numpy(dtype=float, na_value=np.nan)
+        valid = ~np.isnan(values)
+        if not valid.any():
+            continue
+        low, high = values[valid].min(), values[valid].max()
+        scaled = (values[valid] - low) / ((high - low) or 1)
+        steps[valid, i] = np.minimum(
+            (scaled * GRADIENT_STEPS).astype(np.int16), GRADIENT_STEPS - 1
+        )
+    return steps
+
+
+def _formatted(col: pd.Series) -> np.ndarray:
+    """Cell text of ``col``: numbers rounded with thousands separators."""
+    if col.dtype.kind == "f":
+        text = col.map("{:,.0f}".format, na_action="ignore")
+    elif col.dtype.kind in "iu":
+        text = col.map("{:,}".format, na_action="ignore")
+    else:
+        text = col.astype(str).map(html.escape).where(col.notna())
+    return text.fillna("").to_numpy(dtype=object)
+
+
+def _runs(labels: List[np.ndarray], level: int) -> np.ndarray:
+    """Span of each label of ``level`` over the ones repeating it, or 0."""
+    size = len(labels[0])
+    if len(labels) == 1:
+        return np.ones(size, dtype=np.intp)
+    starts = np.zeros(size, dtype=bool)
+    starts[:1] = True
+    for values in labels[: level + 1]:
+        starts[1:] |= values[1:] != values[:-1]
+    first = np.flatnonzero(starts)
+    spans = np.zeros(size, dtype=np.intp)
+    spans[first] = np.diff(np.append(first, size))
+    return spans
+
+
+def _levels(index: pd.Index) -> List[np.ndarray]:
+    return [
+        index.get_level_values(i).astype(str).map(html.escape).to_numpy(dtype=object)
+        for i in range(index.nlevels)
+    ]
+
+
+def _header(df: pd.DataFrame, show_index: bool) -> List[str]:
+    rows = []
+    columns = _levels(df.columns)
+    index_names = list(df.index.names) if show_index else []
+    for level, labels in enumerate(columns):
+        cells = ['<th class="blank">&nbsp;</th>'] * max(len(index_names) - 1, 0)
+        if index_names:
+            name = df.columns.names[level]
+            cells.append(
+                '<th class="blank">&nbsp;</th>'
+                if name is None
+                else f'<th class="index_name">{html.escape(str(name))}</th>'
+            )
+        spans = _runs(columns, level)
+        cells.extend(
+            f'<th class="col_heading level{level}" colspan="{span}">{label}</th>'
+            if span > 1
+            else f'<th class="col_heading level{level}">{label}</th>'
+            for label, span in zip(labels, spans)
+            if span
+        )
+        rows.append(f"<tr>{''.join(cells)}</tr>")
+    if any(name is not None for name in index_names):
+        cells = [
+            f'<th class="index_name">{html.escape(str(name or ""))}</th>'
+            for name in index_names
+        ]
+        cells.extend(['<th class="blank">&nbsp;</th>'] * df.shape[1])
+        rows.append(f"<tr>{''.join(cells)}</tr>")
+    return rows
+
+
+def df_html(
+    df: pd.DataFrame,
+    show_index: bool = True,
+    cmap: Any = None,
+    table_id: Optional[str] = None,
+) -> str:
+    """HTML table of ``df`` styled like :meth:`View.df_style`.
+
+    Cell colours are picked per column from ``GRADIENT_STEPS`` steps of the
+    ``cmap`` gradient and written as CSS classes, with one ``<style>`` rule
+    per step used, instead of a style per cell.
+    """
+    table_id = table_id or f"T_{uuid.uuid4().hex[:5]}"
+    cmap = cmap or sns.light_palette("seagreen", as_cmap=True)
+    steps = gradient_steps(df)
+    used = np.unique(steps[steps >= 0])
+    colors = cmap((used + 0.5) / GRADIENT_STEPS)
+    style = [TABLE_STYLE.format(id=table_id)]
+    style.extend(
+        f"#{table_id} td.g{step} {{ background-color: "
+        f"#{int(r * 255):02x}{int(g * 255):02x}{int(b * 255):02x}; }}\n"
+        for step, (r, g, b, _) in zip(used, colors)
+    )
+    style.append(f"#{table_id} td:hover {{ background-color: #EFEFE0; }}\n")
+
+    classes = np.where(steps >= 0, np.char.add("g", steps.astype(str)), "")
+    classes = classes.astype(object)
+    for i, (_, col) in enumerate(df.items()):
+        if col.dtype.kind in "iuf":
+            values = col.to_numpy(dtype=float, na_value=np.nan)
+            classes[values < 0, i] += " neg"
+            classes[np.isnan(values), i] = "na"
+    opens = np.where(classes == "", "<td>", '<td class="' + classes + '">')
+    cells = np.empty(df.shape, dtype=object)
+    for i, (_, col) in enumerate(df.items()):
+        cells[:, i] = opens[:, i] + _formatted(col) + "</td>"
+
+    heads = np.full(len(df), "", dtype=object)
+    if show_index:
+        labels = _levels(df.index)
+        for level, names in enumerate(labels):
+            spans = _runs(labels, level)
+            tags = np.where(
+                spans > 1,
+                np.char.add(np.char.add(' rowspan="', spans.astype(str)), '"'),
+                "",
+            ).astype(object)
+            heads += np.where(
+                spans > 0,
+                f'<th class="row_heading level{level}"' + tags + ">" + names + "</th>",
+                "",
+            )
+    body = [
+        f"<tr>{head}{''.join(row)}</tr>" for head, row in zip(heads, cells.tolist())
+    ]
+    return "".join(
+        [
+            f'<style type="text/css">{"".join(style)}</style>\n',
+            f'<table id="{table_id}" border="1" border-color="grey">\n',
+            "<thead>",
+            *_header(df, show_index),
+            "</thead>\n<tbody>\n",
+            "\n".join(body),
+            "\n</tbody>\n</table>\n",
+        ]
+    )
@@ -1,32 +1,150 @@
 from __future__ import annotations
 
 import re
-from typing import Any, Dict, List, Optional, Tuple
+import weakref
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
 
+import numpy as np
 import pandas as pd
 import yaml
 from icecream import ic
 
+if TYPE_CHECKING:
+    from .ntypes import StrLStrTypeVar
+
 NO_XLATIONS_SPECIALS = ["LOB", "PL", "PI"]
 
 
+PYTYPES_SAMPLE = 100
+PYTYPE_OVERRIDES = {
+    "datetime.date": "date",
+    "pandas.core.frame.DataFrame": "pd",
+}
+_DTYPE_PYTYPES = {
+    "b": "bool",
+    "i": "int",
+    "u": "int",
+    "f": "float",
+    "c": "complex",
+    "M": "pandas._libs.tslibs.timestamps.Timestamp",
+    "m": "pandas._libs.tslibs.timedeltas.Timedelta",
+}
+_PYTYPES_CACHE: Dict[int, Dict[Tuple[Any, str], str]] = {}
+
+
+def col_pytype(col: pd.Series, sample: int = PYTYPES_SAMPLE) -> str:
+    """Python type name of a column's values, e.g. ``int``, ``str`` or ``pd``.
+
+    Typed columns are answered from their dtype; object columns look at the
+    first non null value within the first ``sample`` rows.
+    """
+    dtype = col.dtype
+    if isinstance(dtype, pd.CategoricalDtype):
+        return col_pytype(pd.Series(dtype.categories), sample)
+    if not pd.api.types.is_object_dtype(dtype) and pd.api.types.is_string_dtype(dtype):
+        return "str"
+    if isinstance(dtype, pd.ArrowDtype) and str(dtype.pyarrow_dtype).startswith("date"):
+        return "date"
+    if dtype.kind in _DTYPE_PYTYPES:
+        return _DTYPE_PYTYPES[dtype.kind]
+    head = col.head(sample)
+    values = head[head.notna()]
+    if values.empty:
+        values = head
+    if values.empty:
+        return "str"
+    vtype = type(values.iloc[0])
+    ptype = f"{vtype.__module__}.{vtype.__qualname__}".removeprefix("builtins.")
+    return PYTYPE_OVERRIDES.get(ptype, ptype)
+
+
 def df_pytypes(df: pd.DataFrame) -> Dict[str, str]:
-    overrides = {
-        "datetime.date": "date",
-        "pandas.core.frame.DataFrame": "pd",
-    }
-    types = {
-        col: str(df[col].apply(type).unique()[0]).split("'")[1]  # type: ignore  # noqa: PGH003
-        for col in df.columns
-    }
-    for col, ptype in types.items():
-        if ptype in overrides:
-            types[col] = overrides[ptype]
+    """Column name to python type name, see :func:`col_pytype`.
+
+    Results are cached per frame and column dtype, so asking again after
+    columns were added or dropped only inspects the new columns.
+    """
+    cache = _PYTYPES_CACHE.get(id(df))
+    if cache is None:
+        cache = _PYTYPES_CACHE[id(df)] = {}
+        weakref.finalize(df, _PYTYPES_CACHE.pop, id(df), None)
+    types: Dict[str, str] = {}
+    for col, ser in df.items():
+        ckey = (col, str(ser.dtype))
+        if ckey not in cache:
+            cache[ckey] = col_pytype(ser)
+        types[col] = cache[ckey]  # type: ignore  # noqa: PGH003
     return types
 
 
+def df_keys(df: pd.DataFrame, cols: StrLStrTypeVar, sep: str = "|") -> pd.Series:
+    """Composite ``a|b|c`` key for every row, built column by column.
+
+    Equivalent to ``df[cols].astype(str).agg(sep.join, axis=1)`` but the
+    concatenation runs over whole columns instead of one Python call per row.
+    """
+    if isinstance(cols, str):
+        cols = cols.split(",")
+    if not cols:
+        raise ValueError("At least one key column is required")
+    parts = [df[col].astype(str) for col in cols]
+    keys: pd.Series = parts[0].str.cat(parts[1:], sep=sep) if parts[1:] else parts[0]
+    return keys.rename("key")
+
+
+NESTED_GATHER_ROWS = 64
+
+
+def _gather_columns(frames: List[pd.DataFrame]) -> Optional[Dict[str, Any]]:
+    names = frames[0].columns.tolist()
+    if not all(isinstance(dtype, np.dtype) for dtype in frames[0].dtypes):
+        return None
+    arrays: List[List[Any]] = [[] for _ in names]
+    for frame in frames:
+        if frame.columns.tolist() != names:
+            return None
+        for i, (_, ser) in enumerate(frame.items()):
+            arrays[i].append(ser.to_numpy())
+    return {name: np.concatenate(arrs) for name, arrs in zip(names, arrays)}
+
+
+def flatten_nested(col: pd.Series, pkey: str = "pkey") -> pd.DataFrame:
+    """Stack the DataFrames held in ``col`` into one frame.
+
+    ``pkey`` holds the index of the parent row, repeated per child. Small sub
+    frames (under ``NESTED_GATHER_ROWS`` rows on average) have their column
+    arrays gathered in one pass and joined with a single ``np.concatenate``
+    per column, which avoids the per frame overhead of ``pd.concat``; larger
+    ones, or ones with differing columns or extension dtypes, are stacked
+    with ``pd.concat``.
+    """
+    values = col.tolist()
+    frames = [f for f in values if isinstance(f, pd.DataFrame)]
+    lengths = np.fromiter(
+        (len(f) if isinstance(f, pd.DataFrame) else 0 for f in values),
+        dtype=np.intp,
+        count=len(values),
+    )
+    parents = np.repeat(col.index.to_numpy(), lengths)
+    if not frames:
+        return pd.DataFrame({pkey: parents})
+
+    data = None
+    if lengths.sum() < NESTED_GATHER_ROWS * len(frames):
+        data = _gather_columns(frames)
+    ndf = pd.DataFrame(data) if data else pd.concat(frames, ignore_index=True)
+    ndf[pkey] = parents
+    return ndf
+
+
+XLATE_CACHE_SIZE = 4096
+_NON_WORD = re.compile(r"\W+")
+
+
+@lru_cache(maxsize=XLATE_CACHE_SIZE)
 def xlate(val: str) -> Tuple[str, str]:
-    var = re.sub(r"\W+", "_", val).lower()
+    var = _NON_WORD.sub("_", val).lower()
     arr: List[str] = [
         i.upper() if i.upper() in NO_XLATIONS_SPECIALS else i.title()
         for i in var.split("_")
@@ -35,6 +153,17 @@ def xlate(val: str) -> Tuple[str, str]:
     return var, eng
 
 
+def xlate_stats() -> Dict[str, Optional[int]]:
+    """Hit/miss counters of the process wide :func:`xlate` cache."""
+    info = xlate.cache_info()
+    return {
+        "hits": info.hits,
+        "misses": info.misses,
+        "size": info.currsize,
+        "maxsize": info.maxsize,
+    }
+
+
 def xlation_map(vals: List[str]) -> Dict[str, Dict[str, str]]:
     xlations: Dict[str, Dict[str, str]] = {
         "human": {},
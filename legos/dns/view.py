@@ -1,64 +1,546 @@
 from __future__ import annotations
 
 import base64
+import hashlib
 import io
-from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Tuple
+import json
+import os
+import time
+from collections import OrderedDict
+from concurrent.futures import Executor, ThreadPoolExecutor
+from functools import cached_property, lru_cache
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple, Union
 
 import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
+from plotly.offline import get_plotlyjs, get_plotlyjs_version
 import seaborn as sns
-from jinja2 import Environment, Template
+from jinja2 import Environment, FileSystemLoader, Template
 
-from .utils import io_stream, is_pivot, read_yaml
+from .composite import EXECUTORS
+from .downsample import DOWNSAMPLERS, chart_data
+from .index import sort_ranks, top_positions
+from .lazy import LazyDS
+from .table import df_html
+from .reader import evict_files
+from .utils import is_pivot, read_yaml, xlate
 
 if TYPE_CHECKING:
+    from collections.abc import Callable, Iterable
+
     from pandas.io.formats.style import Styler
 
     from .ds import DS
 
 
+SPEC_FIELDS = {
+    "pivots": ("index", "columns", "values"),
+    "charts": ("x", "y", "z", "show"),
+    "tables": ("columns",),
+}
+
+
+def spec_fields(names: Any) -> List[str]:
+    """Fields of a spec entry: a list, or a name or comma separated names."""
+    if not names:
+        return []
+    return names.split(",") if isinstance(names, str) else list(names)
+
+
+def reads_all_columns(section: str, spec: Dict[str, Any]) -> bool:
+    """Whether an element reads more than its fields: pivots without values."""
+    return section == "pivots" and not spec.get("values")
+
+
+def report_fields(spec: Dict[str, Any]) -> List[str]:
+    """Fields the pivots, charts and tables of a report spec refer to."""
+    fields: List[str] = []
+    for section, keys in SPEC_FIELDS.items():
+        for element in (spec.get(section) or {}).values():
+            for key in keys:
+                fields.extend(spec_fields(element.get(key)))
+    return list(dict.fromkeys(fields))
+
+
+CHART_TYPES = ("sankey", "line", "bar", "heatmap", "gantt", "histogram")
+REPORT_KEYS = ("header", "footer", "layout")
+_TEMPLATE_ENVS: Dict[str, Environment] = {}
+
+ReportElements = Dict[str, Dict[str, Dict[str, Any]]]
+
+
+def compile_template(jtmpl: str) -> Template:
+    """Compiled Jinja template at path ``jtmpl``.
+
+    Templates are loaded through one shared ``Environment`` per directory,
+    so each is compiled once and again only after its file's mtime changes.
+    """
+    folder, name = os.path.split(os.path.abspath(jtmpl))
+    env = _TEMPLATE_ENVS.get(folder)
+    if env is None:
+        env = Environment(loader=FileSystemLoader(folder), auto_reload=True)
+        _TEMPLATE_ENVS[folder] = env
+    return env.get_template(name)
+
+
+def compile_spec(spec: Optional[Dict[str, Any]]) -> ReportElements:
+    """Validate a report spec and pick the pivots, charts and tables to render.
+
+    Returns the specs of the elements named in ``layout`` per section.
+    """
+    if not spec:
+        raise ValueError("Empty or unreadable report spec")
+    missing = [key for key in REPORT_KEYS if key not in spec]
+    if missing:
+        raise ValueError(f"Report spec is missing {missing}")
+    names = [item["name"] for item in spec["layout"]]
+    elements: ReportElements = {
+        section: {name: elem for name, elem in spec[section].items() if name in names}
+        for section in SPEC_FIELDS
+        if spec.get(section)
+    }
+    known = {name for section in elements.values() for name in section}
+    unknown = [name for name in names if name not in known]
+    if unknown:
+        raise ValueError(f"Layout names {unknown} are not pivots, charts or tables")
+    for name, chart in elements.get("charts", {}).items():
+        if chart.get("type") not in CHART_TYPES:
+            raise ValueError(f"Chart {name} has unknown type {chart.get('type')}")
+    return elements
+
+
+RESULT_CACHE_SIZE = 64 * 2**20
+RESULT_DISK_SIZE = 512 * 2**20
+
+
+class ResultCache:
+    """Size bounded LRU of rendered report elements.
+
+    Entries are the HTML of pivots and tables and the base64 images of
+    charts, kept in memory up to ``max_bytes`` and, with ``cache_dir``, on
+    disk up to ``disk_bytes`` so that other processes can reuse them.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = RESULT_CACHE_SIZE,
+        cache_dir: Optional[str] = None,
+        disk_bytes: int = RESULT_DISK_SIZE,
+    ):
+        self.max_bytes = max_bytes
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self.disk_bytes = disk_bytes
+        self._items: OrderedDict[str, str] = OrderedDict()
+        self._size = 0
+        self.stats = {"memory": 0, "disk": 0, "misses": 0}
+
+    def get(self, key: str) -> Optional[str]:
+        value = self._items.get(key)
+        if value is not None:
+            self._items.move_to_end(key)
+            self.stats["memory"] += 1
+            return value
+        path = self.cache_dir / f"{key}.txt" if self.cache_dir else None
+        if path is not None and path.exists():
+            value = path.read_text(encoding="utf-8")
+            path.touch()
+            self.stats["disk"] += 1
+            self._remember(key, value)
+            return value
+        self.stats["misses"] += 1
+        return None
+
+    def put(self, key: str, value: str) -> None:
+        self._remember(key, value)
+        if self.cache_dir is None:
+            return
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        path = self.cache_dir / f"{key}.txt"
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_text(value, encoding="utf-8")
+        os.replace(tmp, path)
+        evict_files(self.cache_dir, "*.txt", self.disk_bytes)
+
+    def _remember(self, key: str, value: str) -> None:
+        old = self._items.pop(key, None)
+        self._size += len(value) - (len(old) if old else 0)
+        self._items[key] = value
+        while self._size > self.max_bytes and self._items:
+            _, dropped = self._items.popitem(last=False)
+            self._size -= len(dropped)
+
+    def clear(self) -> None:
+        self._items.clear()
+        self._size = 0
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+CHART_FORMATS = {"png": "image/png", "svg": "image/svg+xml", "json": "application/json"}
+
+
+def export_chart(fig: go.Figure, fmt: str) -> str:
+    """Serialize ``fig`` as ``fmt``, a key of ``CHART_FORMATS``.
+
+    ``json`` is the figure spec for plotly.js to draw client side, images
+    are base64 encoded and need the optional ``kaleido`` exporter.
+    """
+    if fmt == "json":
+        return fig.to_json()
+    try:
+        image = fig.to_image(format=fmt)
+    except ValueError as exc:
+        raise ValueError(
+            f"Exporting {fmt} charts needs kaleido, or use chart_format='json'"
+        ) from exc
+    return base64.b64encode(image).decode()
+
+
+PLOTLY_JS = ("inline", "cdn")
+
+
+@lru_cache(maxsize=None)
+def plotly_script(source: str = "inline") -> str:
+    """``<script>`` element loading plotly.js for ``json`` charts.
+
+    ``inline`` embeds the copy shipped with plotly so reports work offline
+    and as standalone files; ``cdn`` links the same version instead.
+    """
+    if source not in PLOTLY_JS:
+        raise ValueError(f"Unknown plotly.js source {source}, use one of {PLOTLY_JS}")
+    if source == "cdn":
+        url = f"https://cdn.plot.ly/plotly-{get_plotlyjs_version()}.min.js"
+        return f'<script src="{url}" charset="utf-8"></script>'
+    return f'<script type="text/javascript">{get_plotlyjs()}</script>'
+
+
+def sankey_links(
+    df: pd.DataFrame, levels: List[str], value_col: str
+) -> Tuple[List[Any], np.ndarray, np.ndarray, np.ndarray]:
+    """Node labels and ``source``, ``target``, ``value`` links of a Sankey.
+
+    Nodes are the sorted distinct values of ``levels``, a value shared by
+    two levels being one node. Links join adjacent levels with the sum of
+    ``value_col`` over the rows holding both values; rows with a missing
+    value in a level do not flow from it or any level after it. Rows are
+    summed once per distinct path of level values, then paths per link.
+    """
+    if len(levels) < 2:  # noqa: PLR2004
+        raise ValueError(f"A Sankey needs two levels or more, got {levels}")
+    missing = [col for col in [*levels, value_col] if col not in df.columns]
+    if missing:
+        raise ValueError(f"Columns {missing} not found in DataFrame")
+    codes, uniques = zip(*(pd.factorize(df[level], sort=True) for level in levels))
+    labels = pd.Index(np.concatenate(uniques)).unique().sort_values()
+    nodes = [labels.get_indexer(level_uniques) for level_uniques in uniques]
+
+    path, span = np.zeros(len(df), dtype=np.int64), 1
+    for level_codes, level_uniques in zip(codes, uniques):
+        if span * (len(level_uniques) + 1) >= 2**63:
+            path, found = pd.factorize(path)
+            span = len(found)
+        path = path * (len(level_uniques) + 1) + level_codes + 1
+        span *= len(level_uniques) + 1
+    path_ids, paths = pd.factorize(path)
+    first = np.empty(len(paths), dtype=np.intp)
+    first[path_ids[::-1]] = np.arange(len(df))[::-1]
+    path_codes = [level_codes[first] for level_codes in codes]
+    weights = df[value_col].to_numpy(dtype=float, na_value=0.0)
+    path_values = np.bincount(path_ids, weights=weights, minlength=len(paths))
+    reached = path_codes[0] >= 0
+    sources, targets, values = [], [], []
+    for i in range(1, len(levels)):
+        reached &= path_codes[i] >= 0
+        pair = (
+            nodes[i - 1][path_codes[i - 1][reached]] * len(labels)
+            + nodes[i][path_codes[i][reached]]
+        )
+        pairs, inverse = np.unique(pair, return_inverse=True)
+        sources.append(pairs // len(labels))
+        targets.append(pairs % len(labels))
+        values.append(np.bincount(inverse, weights=path_values[reached]))
+    value = np.concatenate(values)
+    if df[value_col].dtype.kind in "iub":
+        value = np.rint(value).astype(np.int64)
+    return labels.tolist(), np.concatenate(sources), np.concatenate(targets), value
+
+
+def link_colors(count: int, cmap: str = "Set3", alpha: float = 0.8) -> np.ndarray:
+    """``count`` rgba strings spread over the colormap ``cmap``."""
+    if not count:
+        return np.array([], dtype=str)
+    rgb = (
+        plt.colormaps[cmap].resampled(count)(np.linspace(0, 1, count))[:, :3] * 255
+    ).astype(int)
+    colors, inverse = np.unique(rgb, axis=0, return_inverse=True)
+    palette = np.array([f"rgba({r}, {g}, {b}, {alpha})" for r, g, b in colors])
+    return palette[inverse.reshape(-1)]
+
+
+class Report:
+    """Report compiled once and rendered against fresh data.
+
+    The spec is read and validated and the template compiled on creation;
+    :meth:`render` only computes the layout's elements over ``ds``.
+    """
+
+    def __init__(
+        self,
+        report_spec: Union[str, Dict[str, Any]],
+        jtmpl: str,
+        cache: Optional[ResultCache] = None,
+        **kwargs: Any,
+    ):
+        if isinstance(report_spec, str):
+            report_spec = read_yaml(report_spec)
+        self.elements = compile_spec(report_spec)
+        self.spec: Dict[str, Any] = report_spec  # type: ignore  # noqa: PGH003
+        self.template = compile_template(jtmpl)
+        self.cache = cache
+        self.kwargs = kwargs
+        self.timings: Dict[str, float] = {}
+        self.chart_stats: Dict[str, Dict[str, float]] = {}
+
+    def render(self, ds: Union[DS, LazyDS]) -> str:
+        """Render over ``ds``; ``kwargs`` of the report are passed to View."""
+        view = View(self.spec, ds, cache=self.cache, **self.kwargs)
+        html = view.render_elements(self.template, self.elements)
+        self.timings = view.timings
+        self.chart_stats = view.chart_stats
+        return html
+
+
+def _timed(func: Callable[..., Any], *args: Any) -> Tuple[Any, float]:
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def _chart(
+    df: pd.DataFrame, spec: Dict[str, Any], options: Dict[str, Any]
+) -> Tuple[Optional[str], float]:
+    """Exported chart of ``spec`` over ``df``, run in a chart executor worker."""
+    return _timed(View({}, df, **options)._df_chart, spec)
+
+
+MAX_CHART_POINTS = 2000
+TABLE_RENDERERS = ("html", "styler")
+
+
 class View:
-    def __init__(self, report_spec: str, ds: DS):
-        self.spec: Dict[str, Any] = read_yaml(report_spec)
-        self.df: pd.DataFrame = ds.df_humanized
-        self.jenv: Environment = Environment()
+    def __init__(
+        self,
+        report_spec: Union[str, Dict[str, Any]],
+        ds: Union[DS, LazyDS, pd.DataFrame],
+        cache: Optional[ResultCache] = None,
+        max_workers: Optional[int] = None,
+        chart_executor: Union[str, Executor] = "thread",
+        chart_format: str = "json",
+        max_points: Optional[int] = MAX_CHART_POINTS,
+        downsample: str = "lttb",
+        table_renderer: str = "html",
+        plotly_js: str = "inline",
+    ):
+        """Report elements over ``ds``.
+
+        With a ``cache`` rendered elements are reused while the spec of the
+        element and the content of the fields it refers to are unchanged.
+        A frame is taken as already humanized data and is never cached.
+
+        With ``max_workers`` the elements are rendered concurrently: pivots
+        and tables on a thread pool, charts on ``chart_executor``, a key of
+        ``EXECUTORS`` or a running executor to reuse. Charts are built with
+        plotly, which needs no process of its own, so they share threads by
+        default; a process pool pickles the frame for each chart.
+
+        Charts are exported headless as ``chart_format``, see
+        :func:`export_chart`; the ``json`` default needs no image exporter
+        and is drawn by plotly.js, given to templates as ``plotly_script``
+        from ``plotly_js``, see :func:`plotly_script`. :attr:`chart_stats`
+        has the size and seconds of each after a render. Bars are summed per x and hue and lines cut
+        to ``max_points`` per series with ``downsample``, a key of
+        ``DOWNSAMPLERS``, before drawing; ``None`` draws every row.
+
+        Pivots and tables are written by :func:`df_html` or, with
+        ``table_renderer="styler"``, through :meth:`df_style`.
+        """
+        if isinstance(report_spec, str):
+            report_spec = read_yaml(report_spec)
+        if plotly_js not in PLOTLY_JS:
+            raise ValueError(
+                f"Unknown plotly.js source {plotly_js}, use one of {PLOTLY_JS}"
+            )
+        if isinstance(chart_executor, str) and chart_executor not in EXECUTORS:
+            raise ValueError(
+                f"Unknown executor {chart_executor}, use one of {EXECUTORS}"
+            )
+        if chart_format not in CHART_FORMATS:
+            raise ValueError(
+                f"Unknown chart format {chart_format}, use one of {list(CHART_FORMATS)}"
+            )
+        if table_renderer not in TABLE_RENDERERS:
+            raise ValueError(
+                f"Unknown table renderer {table_renderer}, use one of {TABLE_RENDERERS}"
+            )
+        if downsample not in DOWNSAMPLERS:
+            raise ValueError(
+                f"Unknown downsampling {downsample}, use one of {DOWNSAMPLERS}"
+            )
+        self.spec: Dict[str, Any] = report_spec  # type: ignore  # noqa: PGH003
+        if isinstance(ds, LazyDS):
+            if not any(
+                reads_all_columns(section, element)
+                for section in SPEC_FIELDS
+                for element in (self.spec.get(section) or {}).values()
+            ):
+                ds = ds.select(report_fields(self.spec))
+            ds = ds.collect()
+        if isinstance(ds, pd.DataFrame):
+            self.__dict__["df"], ds, cache = ds, None, None
+        self.ds = ds
+        self.cache = cache
+        self.max_workers = max_workers
+        self.chart_executor = chart_executor
+        self.chart_format = chart_format
+        self.max_points = max_points
+        self.downsample = downsample
+        self.table_renderer = table_renderer
+        self.plotly_js = plotly_js
+        self.timings: Dict[str, float] = {}
+        self.chart_stats: Dict[str, Dict[str, float]] = {}
         sns.set_theme(style="darkgrid")
 
-    def render(self, jtmpl: str) -> str:
-        layout = "layout"
-        template: Template = self.jenv.from_string(str(io_stream(jtmpl)))
-        names = [i["name"] for i in self.spec[layout]]
-        elements = {}
-        items: List[Tuple[str, Callable[[Dict[str, Any]], Any]]] = [
-            ("pivots", self._df_pivot),
-            ("charts", self._df_chart),
-            ("tables", self._df_table),
-        ]
-        for k, v in items:
-            if self.spec.get(k):
-                elements[k] = {
-                    name: v(spc) for name, spc in self.spec[k].items() if name in names
-                }
-
-        to_style: Dict[str, pd.DataFrame] = {
-            **elements.get("pivots", {}),
-            **elements.get("tables", {}),
+    @property
+    def chart_options(self) -> Dict[str, Any]:
+        return {
+            "chart_format": self.chart_format,
+            "max_points": self.max_points,
+            "downsample": self.downsample,
         }
-        styled_data = {
-            name: self.df_style(data).to_html() for name, data in to_style.items()
+
+    @cached_property
+    def df(self) -> pd.DataFrame:
+        return self.ds.df_humanized
+
+    def render(self, jtmpl: str) -> str:
+        elements = compile_spec(self.spec)
+        return self.render_elements(compile_template(jtmpl), elements)
+
+    def render_elements(self, template: Template, specs: ReportElements) -> str:
+        """Render ``template`` with the pivots, charts and tables of ``specs``.
+
+        Elements keep the order of ``specs`` however they were computed, and
+        the seconds each took are left in :attr:`timings` by element name.
+        """
+        results: Dict[Tuple[str, str], Optional[str]] = {}
+        self.timings = {}
+        pending: Dict[Tuple[str, str], Optional[str]] = {}
+        for section, section_specs in specs.items():
+            for name, spec in section_specs.items():
+                key = self._cache_key(section, spec) if self.cache is not None else None
+                cached = self.cache.get(key) if key is not None else None  # type: ignore  # noqa: PGH003
+                if cached is not None:
+                    results[section, name] = cached
+                    self.timings[name] = 0.0
+                else:
+                    pending[section, name] = key
+
+        for (section, name), (rendered, secs) in self._compute(specs, pending):
+            results[section, name] = rendered
+            self.timings[name] = secs
+            key = pending[section, name]
+            if key is not None and rendered is not None:
+                self.cache.put(key, rendered)  # type: ignore  # noqa: PGH003
+
+        styled_data: Dict[str, Optional[str]] = {}
+        charts: Dict[str, Optional[str]] = {}
+        for section, section_specs in specs.items():
+            rendered = charts if section == "charts" else styled_data
+            for name in section_specs:
+                rendered[name] = results[section, name]
+        self.chart_stats = {
+            name: {"bytes": len(chart or ""), "secs": self.timings[name]}
+            for name, chart in charts.items()
         }
 
         return template.render(
             header=self.spec["header"],
             footer=self.spec["footer"],
             styled_data=styled_data,
-            charts=elements.get("charts", {}),
-            layout=self.spec[layout],
+            charts=charts,
+            chart_format=self.chart_format,
+            chart_mime=CHART_FORMATS[self.chart_format],
+            plotly_script=(
+                plotly_script(self.plotly_js)
+                if charts and self.chart_format == "json"
+                else ""
+            ),
+            layout=self.spec["layout"],
         )
 
+    def _compute(
+        self, specs: ReportElements, names: Iterable[Tuple[str, str]]
+    ) -> List[Tuple[Tuple[str, str], Tuple[Optional[str], float]]]:
+        """Render the ``(section, name)`` elements of ``specs`` with timings."""
+        names = list(names)
+        if self.max_workers is None:
+            return [(item, _timed(self._element, *item, specs)) for item in names]
+
+        df = self.df
+        charts = self.chart_executor
+        own = isinstance(charts, str)
+        tables = ThreadPoolExecutor(max_workers=self.max_workers)
+        if own:
+            charts = EXECUTORS[charts](max_workers=self.max_workers)  # type: ignore  # noqa: PGH003
+        try:
+            futures = [
+                (
+                    (section, name),
+                    charts.submit(_chart, df, specs[section][name], self.chart_options)  # type: ignore  # noqa: PGH003
+                    if section == "charts"
+                    else tables.submit(_timed, self._element, section, name, specs),
+                )
+                for section, name in names
+            ]
+            return [(item, future.result()) for item, future in futures]
+        finally:
+            tables.shutdown()
+            if own:
+                charts.shutdown()  # type: ignore  # noqa: PGH003
+
+    def _element(self, section: str, name: str, specs: ReportElements) -> Optional[str]:
+        spec = specs[section][name]
+        if section == "charts":
+            return self._df_chart(spec)
+        data = self._df_pivot(spec) if section == "pivots" else self._df_table(spec)
+        if self.table_renderer == "styler":
+            return self.df_style(data).to_html()
+        return df_html(data, show_index=is_pivot(data) and "key" not in data.columns)
+
+    def _read_columns(self, section: str, spec: Dict[str, Any]) -> List[str]:
+        """DS columns an element reads, all of them when some can't be told.
+
+        Pivots without ``values`` aggregate every other column.
+        """
+        columns = list(self.ds.df.columns)
+        if reads_all_columns(section, spec):
+            return columns
+        cols = [xlate(field)[0] for field in report_fields({section: {"": spec}})]
+        return cols if cols and set(cols) <= set(columns) else columns
+
+    def _cache_key(self, section: str, spec: Dict[str, Any]) -> str:
+        hashes = [self.ds.column_hash(col) for col in self._read_columns(section, spec)]
+        options = self.chart_options if section == "charts" else self.table_renderer
+        fingerprint = json.dumps(
+            [section, spec, hashes, options], sort_keys=True, default=str
+        )
+        return hashlib.sha256(fingerprint.encode()).hexdigest()
+
     def _df_pivot(self, spec: Dict[str, Any]) -> pd.DataFrame:
         return pd.pivot_table(self.df, **spec)
 
@@ -74,6 +556,24 @@ class View:
         }
 
     def _df_chart(self, spec: Dict[str, Any]) -> Optional[str]:
+        fig = self.chart_figure(spec)
+        return None if fig is None else export_chart(fig, self.chart_format)
+
+    def _chart_data(
+        self, df: pd.DataFrame, kind: str, spec: Dict[str, Any]
+    ) -> pd.DataFrame:
+        return chart_data(
+            df,
+            kind,
+            spec["x"],
+            spec["y"],
+            spec.get("z"),
+            self.max_points,
+            self.downsample,
+        )
+
+    def chart_figure(self, spec: Dict[str, Any]) -> Optional[go.Figure]:
+        """Plotly figure of a chart spec, e.g. to ``show()`` interactively."""
         px_defaults = {
             "width": 2000,
             "height": 1000,
@@ -90,7 +590,7 @@ class View:
         """
 
         cparams: Dict[str, Any] = {
-            "data": self.df.sort_values(by=spec["x"]),
+            "data": self.df,
             "x": spec["x"],
             "y": spec["y"],
             "hue": spec.get("z"),
@@ -123,13 +623,12 @@ class View:
                 "text": spec["show"],
             }
         elif chart_type == "histogram":
-            bins = pd.date_range(start="2023-01-01", end="2024-02-01", freq="1M")
-            self.df["Bin"] = pd.cut(self.df[spec["x"]], bins=bins)
             cols = [spec["x"], spec["z"]]
             result = self.df.groupby(cols, as_index=False)[spec["y"]].sum()
-            cparams = {"data": result}
+            cparams = {"data": self._chart_data(result, "line", spec)}
+        elif chart_type in ("line", "bar"):
+            cparams["data"] = self._chart_data(self.df, chart_type, spec)
 
-        plt.figure(figsize=(50, 50))  # Increase figure size
         fig: Any = None
         if chart_type in ["line", "histogram"]:
             fig = px.line(
@@ -163,78 +662,21 @@ class View:
                 text=cparams["text"],
             )
         elif chart_type == "sankey":
-            fig = self._sankey(self.df)
+            fig = self._sankey(
+                self.df, spec_fields(spec["x"]), spec["y"], spec.get("title")
+            )
 
         fig.update_layout(**px_defaults)
-        fig.show()
-        plt.tight_layout()
-
-        img = io.BytesIO()
-        plt.savefig(img, format="png", bbox_inches="tight", dpi=300)
-        img.seek(0)
-        plt.close()
-
-        return base64.b64encode(img.getvalue()).decode()
-
-    def _sankey(self, df, levels, value_col, title) -> None:
-        for level in levels:
-            if level not in df.columns:
-                raise ValueError(f"Column '{level}' not found in DataFrame")
-
-        if value_col not in df.columns:
-            raise ValueError(f"Value column '{value_col}' not found in DataFrame")
-
-        agg_dfs = []
-        for i in range(len(levels)):
-            agg_df = df.groupby(levels[: i + 1])[value_col].sum().reset_index()
-            agg_df = agg_df.sort_values(
-                by=levels[i]
-            )  # Sort alphabetically at each level
-            agg_dfs.append(agg_df)
-
-        labels = []
-        for i, agg_df in enumerate(agg_dfs):
-            labels.extend(agg_df[levels[i]].unique().tolist())
-        labels = sorted(dict.fromkeys(labels))
-
-        label_indices = {label: i for i, label in enumerate(labels)}
-
-        source = []
-        target = []
-        value = []
-
-        for i in range(len(agg_dfs) - 1, 0, -1):
-            for _, row in agg_dfs[i].iterrows():
-                source.append(label_indices[row[levels[i - 1]]])
-                target.append(label_indices[row[levels[i]]])
-                value.append(row[value_col])
-
-        def _hover_nodes() -> List:
-            node_hover_text = []
-            incoming_flows = {i: [] for i in range(len(labels))}
-            outgoing_flows = {i: [] for i in range(len(labels))}
-
-            for s, t, v in zip(source, target, value):
-                outgoing_flows[s].append((labels[t], v))
-                incoming_flows[t].append((labels[s], v))
-
-            for i in range(len(labels)):
-                in_text = "<br>".join([f"From {s}: {v}" for s, v in incoming_flows[i]])
-                out_text = "<br>".join([f"To {t}: {v}" for t, v in outgoing_flows[i]])
-                hover_text = f"{labels[i]}<br><br>Incoming:<br>{in_text}<br><br>Outgoing:<br>{out_text}"
-                node_hover_text.append(hover_text)
-            return node_hover_text
-
-        def generate_colors(num_colors):
-            colors = plt.cm.get_cmap("Set3", num_colors)
-            return [
-                "rgba({}, {}, {}, 0.8)".format(int(r * 255), int(g * 255), int(b * 255))
-                for r, g, b, _ in colors(np.linspace(0, 1, num_colors))
-            ]
-
-        # node_colors = generate_colors(len(labels))
-        link_colors = generate_colors(len(source))
+        return fig
 
+    def _sankey(
+        self,
+        df: pd.DataFrame,
+        levels: List[str],
+        value_col: str,
+        title: Optional[str] = None,
+    ) -> go.Figure:
+        labels, source, target, value = sankey_links(df, levels, value_col)
         fig = go.Figure(
             data=[
                 go.Sankey(
@@ -243,27 +685,22 @@ class View:
                         "thickness": 30,
                         "line": {"color": "gray", "width": 1.5},
                         "label": labels,
-                        # "color": node_colors,
                     },
                     link={
                         "source": source,
                         "target": target,
                         "value": value,
                         "label": value,
-                        "color": link_colors,
+                        "color": link_colors(len(source)),
                         "hovertemplate": "%{source.label} → %{target.label}<br>Total: %{value}<extra></extra>",
                     },
                 )
             ]
         )
-        # node_hovers = _hover_nodes()
-        # fig.update_traces(node={"hovertemplate": node_hovers})
-
         fig.update_layout(
             title_text=title,
             font_size=12,
         )
-        fig.show()
         return fig
 
     def _annot(fig):
@@ -286,7 +723,7 @@ class View:
         if chart_type not in ["line", "bar", "heatmap", "gantt", "histogram"]:
             return None
         cparams: Dict[str, Any] = {
-            "data": self.df.sort_values(by=spec["x"]),
+            "data": self.df,
             "x": spec["x"],
             "y": spec["y"],
             "hue": spec.get("z"),
@@ -389,11 +826,19 @@ class View:
         return base64.b64encode(img.getvalue()).decode()
 
     def _df_table(self, spec: Dict[str, Any]) -> pd.DataFrame:
-        return (
-            self.df[spec["columns"]]
-            .sort_values(by=spec["columns"])
-            .head(spec.get("rows", 10))
-        )  # type: ignore  # noqa: PGH003
+        """Page of ``rows`` rows from ``offset`` in order of the ``columns``.
+
+        Rows are selected from ranks the DS keeps per columns and version,
+        shared by the tables of a report and later pages, not by a sort.
+        """
+        columns = spec["columns"]
+        limit, offset = spec.get("rows", 10), spec.get("offset", 0)
+        fields = [xlate(col)[0] for col in columns]
+        if self.ds is not None and set(fields) <= set(self.ds.df.columns):
+            positions = self.ds._top_positions(fields, limit, offset)
+        else:
+            positions = top_positions(sort_ranks(self.df, columns), limit, offset)
+        return self.df[columns].take(positions)
 
     def df_style(self, df: pd.DataFrame, is_table: bool = False) -> Styler:
         def _color_negative_red(val: Any) -> str:
@@ -0,0 +1,557 @@
+"""Micro benchmarks for DS internals.
+
+Run from the project root with ``python -m tests.bench_ds [name ...]``.
+"""
+
+import base64
+import io
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Tuple
+
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+from jinja2 import Environment
+
+from dns.ds import DS
+from dns.pipeline import Pipeline
+from dns.reader import Reader
+from dns.table import df_html
+from dns.utils import df_keys, flatten_nested, io_stream, read_yaml
+from dns.view import Report, ResultCache, View, compile_spec, link_colors, sankey_links
+
+from .fixtures.tdf import fake_bow_df, fake_funding_df
+
+SIZES: Tuple[int, ...] = (10_000, 100_000, 1_000_000)
+
+
+def _timeit(fn: Callable[[], Any], repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _peak_mb(fn: Callable[[], Any]) -> float:
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    keep = fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del keep
+    return peak / 2**20
+
+
+def _report(title: str, rows: List[Dict[str, Any]]) -> None:
+    print(f"\n{title}")
+    print(pd.DataFrame(rows).to_string(index=False))
+
+
+def bow_like_df(num_rows: int, seed: int = 72) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    groups = np.array(["DNS", "EES", "DMO", "RISK", "MDA"])
+    return pd.DataFrame(
+        {
+            "group": groups[rng.integers(0, len(groups), num_rows)],
+            "headline": [f"Milestone {i}" for i in range(num_rows)],
+            "effort": rng.integers(1, 30, num_rows),
+            "errors": rng.integers(0, 100, num_rows),
+        }
+    )
+
+
+def bench_keys(sizes: Tuple[int, ...] = SIZES) -> None:
+    cols = ["group", "headline", "effort"]
+    rows = []
+    for size in sizes:
+        df = bow_like_df(size)
+        agg = _timeit(lambda df=df: df[cols].astype(str).agg("|".join, axis=1), 1)
+        vec = _timeit(lambda df=df: df_keys(df, cols))
+        rows.append(
+            {"rows": size, "agg_s": agg, "df_keys_s": vec, "speedup": agg / vec}
+        )
+    _report("Composite keys", rows)
+
+
+def wide_df(num_rows: int, num_cols: int = 40, seed: int = 72) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    data = {f"col_{i}": rng.random(num_rows) for i in range(num_cols)}
+    data["name"] = [f"Row {i}" for i in range(num_rows)]
+    return pd.DataFrame(data)
+
+
+def bench_kv(sizes: Tuple[int, ...] = (10_000, 100_000)) -> None:
+    rows = []
+    for size in sizes:
+        ds = DS(wide_df(size), keys="name")
+        hot = ds.df.index[:5]
+        eager = _peak_mb(lambda ds=ds: ds.df.to_dict(orient="index"))
+        lazy = _peak_mb(lambda ds=ds, hot=hot: [ds[key] for key in hot])
+        rows.append({"rows": size, "to_dict_mb": eager, "lazy_kv_mb": lazy})
+    _report("KV peak memory (5 lookups)", rows)
+
+
+def bench_join(left_rows: int = 1_000_000, right_rows: int = 100_000) -> None:
+    rng = np.random.default_rng(72)
+    ldf = pd.DataFrame(
+        {"id": np.arange(left_rows), "ref": rng.integers(0, right_rows, left_rows)}
+    )
+    rdf = pd.DataFrame({"ref": np.arange(right_rows), "amount": rng.random(right_rows)})
+    left = DS(ldf, keys="id", copy=False)
+    right = DS(rdf, keys="ref", copy=False)
+
+    def by_strings() -> pd.DataFrame:
+        lk = left.df.copy()
+        lk["on"] = df_keys(lk, ["ref"])
+        rk = right.df.copy()
+        rk.index = df_keys(rk, ["ref"])
+        return lk.join(rk, on="on", how="left", rsuffix="_b")
+
+    rows = [
+        {"join": "string keys + copies", "secs": _timeit(by_strings, 1)},
+        {
+            "join": "DS.join on ref (m:1)",
+            "secs": _timeit(lambda: left.join(right, on="ref", how="left"), 1),
+        },
+        {
+            "join": "DS.join on key index",
+            "secs": _timeit(lambda: right.join(right, how="inner"), 1),
+        },
+    ]
+    _report(f"Join {left_rows:,} x {right_rows:,}", rows)
+
+
+def bench_nested(parents: int = 100_000, distinct: int = 500) -> None:
+    bow = fake_bow_df(distinct)
+    df = pd.concat([bow] * (parents // distinct), ignore_index=True)
+
+    def by_concat(col: str) -> pd.DataFrame:
+        ndf = pd.concat(df[col].tolist(), keys=df.index)
+        ndf["pkey"] = ndf.index.get_level_values(0)
+        return ndf.reset_index(drop=True)
+
+    rows = []
+    for col in ("Subtasks", "Approvals", "Reviews"):
+        concat = _timeit(lambda col=col: by_concat(col), 1)
+        flat = _timeit(lambda col=col: flatten_nested(df[col]), 1)
+        rows.append(
+            {
+                "column": col,
+                "concat_s": concat,
+                "flatten_s": flat,
+                "speedup": concat / flat,
+            }
+        )
+    _report(f"Nested columns, {len(df):,} parents", rows)
+
+
+def bench_upsert(rows: int = 100_000, updates: Tuple[int, ...] = (500, 2_500)) -> None:
+    report = []
+    for size in updates:
+        changes = {f"Milestone {i}": {"effort": i % 30} for i in range(0, 2 * size, 2)}
+        changes |= {f"New {i}": {"effort": 1} for i in range(size)}
+
+        def row_by_row(changes: Dict[str, Any] = changes) -> None:
+            df = DS(bow_like_df(rows), keys="headline").df
+            for key, value in changes.items():
+                df.loc[key] = value
+
+        def batched(changes: Dict[str, Any] = changes) -> None:
+            DS(bow_like_df(rows), keys="headline").update_many(changes)
+
+        report.append(
+            {
+                "changes": len(changes),
+                "row_by_row_s": _timeit(row_by_row, 1),
+                "update_many_s": _timeit(batched, 1),
+            }
+        )
+    _report(f"Keyed updates into {rows:,} rows (half new keys)", report)
+
+
+def bench_delta(rows: int = 1_000_000, changes: int = 1_000) -> None:
+    ds = DS(bow_like_df(rows), keys="headline", copy=False)
+    ds.update_many({f"Milestone {i}": {"effort": 0} for i in range(changes)})
+    with tempfile.TemporaryDirectory() as tmp:
+        report = [
+            {
+                "save": "full snapshot",
+                "secs": _timeit(lambda: ds.to_arrow(f"{tmp}/base.arrow"), 1),
+            },
+        ]
+        ds.update_many({f"Milestone {i}": {"effort": 1} for i in range(changes)})
+        report.append(
+            {
+                "save": f"delta of {changes:,} rows",
+                "secs": _timeit(lambda: ds.save_delta(f"{tmp}/1.parquet"), 1),
+            }
+        )
+    _report(f"Saving {rows:,} rows", report)
+
+
+def bench_index(rows: int = 1_000_000, lookups: int = 100) -> None:
+    ds = DS(bow_like_df(rows), keys="headline", copy=False)
+
+    def queries() -> None:
+        for i in range(lookups):
+            ds.match({"errors": i % 100})
+            ds.match({"effort": {"between": [i % 29, i % 29 + 1]}})
+
+    scan = _timeit(queries, 1)
+    build = _timeit(
+        lambda: (ds.create_index("errors"), ds.create_index("effort", "sorted")), 1
+    )
+    indexed = _timeit(queries, 1)
+    report = [
+        {"lookups": "column scans", "secs": scan},
+        {"lookups": "index build", "secs": build},
+        {"lookups": "indexed", "secs": indexed},
+    ]
+    _report(f"{2 * lookups} match() calls on {rows:,} rows", report)
+
+    plain = DS(bow_like_df(rows), keys="headline", copy=False)
+
+    def writes(ds: DS) -> None:
+        for i in range(lookups // 5):
+            ds[ds.df.index[i]] = {"errors": i % 100}
+            ds.match({"errors": i % 100})
+
+    report = [
+        {"lookups": "column scans", "secs": _timeit(lambda: writes(plain), 1)},
+        {"lookups": "indexed", "secs": _timeit(lambda: writes(ds), 1)},
+    ]
+    _report(f"{lookups // 5} single row writes and match() calls", report)
+
+
+PIPELINES: Dict[str, List[Dict[str, Any]]] = {
+    "group then filter": [
+        {"group": {"by": "group,effort", "aggs": {"errors": "sum"}}},
+        {"sort": "-errors"},
+        {"match": {"group": ["DNS", "EES"]}},
+    ],
+    "sort then filter": [
+        {"sort": "-errors,headline"},
+        {"match": {"errors": {"between": [0, 4]}}},
+        {"project": "headline,errors"},
+    ],
+    "compute then filter": [
+        {"math": {"load": "effort * errors"}},
+        {"match": {"effort": 7}},
+        {"group": {"by": "group", "aggs": {"load": "mean"}}},
+    ],
+    "melt": [
+        {"match": {"group": "RISK"}},
+        {"melt": {"values": "effort,errors"}},
+    ],
+}
+
+
+def bench_pipeline(rows: int = 1_000_000) -> None:
+    ds = DS(bow_like_df(rows), keys="headline", copy=False)
+    report = []
+    for name, stages in PIPELINES.items():
+        naive = Pipeline(stages, optimize=False)
+        planned = Pipeline(stages)
+        report.append(
+            {
+                "pipeline": name,
+                "in_order_s": _timeit(lambda naive=naive: naive.run(ds), 1),
+                "planned_s": _timeit(lambda planned=planned: planned.run(ds), 1),
+            }
+        )
+    ds.create_index("group")
+    ds.create_index("effort")
+    ds.create_index("errors", "sorted")
+    for row, stages in zip(report, PIPELINES.values()):
+        planned = Pipeline(stages)
+        row["indexed_s"] = _timeit(lambda planned=planned: planned.run(ds), 1)
+    _report(f"Pipelines over {rows:,} rows", report)
+
+
+def bench_lazy(rows: int = 200_000) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        csv = f"{tmp}/wide.csv"
+        wide_df(rows).to_csv(csv, index=False)
+        where = {"col_0": {"between": [0, 0.1]}}
+
+        def eager() -> pd.DataFrame:
+            _, df = Reader(cache=False).to_df(csv)
+            ds = DS(df, keys="name", copy=False)
+            return ds.match(where)[["col_1", "col_2"]]
+
+        def lazy() -> pd.DataFrame:
+            plan = DS.lazy(csv, keys="name", cache=False)
+            return plan.select("col_1,col_2").match(where).df
+
+        report = [
+            {
+                "read": "DS then match",
+                "secs": _timeit(eager, 1),
+                "peak_mb": _peak_mb(eager),
+            },
+            {
+                "read": "LazyDS pushdown",
+                "secs": _timeit(lazy, 1),
+                "peak_mb": _peak_mb(lazy),
+            },
+        ]
+    _report(f"3 of 41 columns, ~10% of {rows:,} csv rows", report)
+
+
+REPORT_SPEC = """
+header: Body of Work
+footer: Team
+pivots:
+    Effort: {index: [Group], values: [Effort], aggfunc: sum}
+tables:
+    Milestones: {columns: [Group, Headline, Effort], rows: 15}
+layout:
+    - {type: pivot, name: Effort}
+    - {type: table, name: Milestones}
+"""
+
+
+def bench_report(rows: int = 10_000, runs: int = 20) -> None:
+    ds = DS(bow_like_df(rows), keys="headline")
+    template = "tests/templates/usecases/lowcode/template.html"
+    with tempfile.TemporaryDirectory() as tmp:
+        spec = f"{tmp}/spec.yaml"
+        with open(spec, "w", encoding="utf-8") as fp:
+            fp.write(REPORT_SPEC)
+
+        def per_call() -> None:
+            for _ in range(runs):
+                parsed = read_yaml(spec)
+                jinja = Environment().from_string(str(io_stream(template)))
+                View(parsed, ds).render_elements(jinja, compile_spec(parsed))
+
+        def compiled(**kwargs: Any) -> None:
+            report = Report(spec, template, **kwargs)
+            for _ in range(runs):
+                report.render(ds)
+
+        def cached() -> None:
+            report = Report(spec, template, cache=ResultCache())
+            for i in range(runs):
+                if i % 5 == 0:
+                    ds[ds.df.index[i]] = {"errors": i}
+                report.render(ds)
+
+        report = [
+            {"render": "parse spec + template per call", "secs": _timeit(per_call)},
+            {"render": "compiled Report", "secs": _timeit(compiled)},
+            {
+                "render": "compiled, elements on 4 threads",
+                "secs": _timeit(lambda: compiled(max_workers=4)),
+            },
+            {"render": "compiled + ResultCache", "secs": _timeit(cached)},
+        ]
+    _report(f"{runs} renders over {rows:,} rows", report)
+
+
+def _pyplot_png() -> str:
+    """The figure round trip charts used to take, for comparison."""
+    plt.figure(figsize=(50, 50))
+    plt.tight_layout()
+    img = io.BytesIO()
+    plt.savefig(img, format="png", bbox_inches="tight", dpi=300)
+    plt.close()
+    return base64.b64encode(img.getvalue()).decode()
+
+
+def bench_charts(rows: int = 10_000) -> None:
+    view = View({}, bow_like_df(rows), chart_format="json")
+    charts = {
+        "bar": {"type": "bar", "x": "group", "y": "effort", "z": "group"},
+        "line": {"type": "line", "x": "effort", "y": "errors", "z": "group"},
+    }
+    report = []
+    for name, spec in charts.items():
+        chart = view._df_chart(spec) or ""
+        report.append(
+            {
+                "chart": name,
+                "export": "plotly json",
+                "bytes": len(chart),
+                "secs": _timeit(lambda spec=spec: view._df_chart(spec)),
+            }
+        )
+    report.append(
+        {
+            "chart": "blank",
+            "export": "pyplot png 50in@300dpi",
+            "bytes": len(_pyplot_png()),
+            "secs": _timeit(_pyplot_png, 1),
+        }
+    )
+    _report(f"Chart export over {rows:,} rows", report)
+
+
+def bench_downsample(rows: int = 1_000_000) -> None:
+    rng = np.random.default_rng(7)
+    order = rng.permutation(rows)
+    df = pd.DataFrame(
+        {
+            "day": pd.Timestamp("2024-01-01") + pd.to_timedelta(order, "s"),
+            "errors": np.cumsum(rng.normal(0, 1, rows))[order],
+            "group": np.array(["DNS", "EES"])[order % 2],
+        }
+    )
+    line = {"type": "line", "x": "day", "y": "errors", "z": "group"}
+    bar = {"type": "bar", "x": "group", "y": "errors", "z": "group"}
+    report = []
+    for spec, max_points, method in (
+        (line, None, "lttb"),
+        (line, 2000, "lttb"),
+        (line, 2000, "minmax"),
+        (bar, None, "lttb"),
+        (bar, 2000, "lttb"),
+    ):
+        view = View(
+            {}, df, chart_format="json", max_points=max_points, downsample=method
+        )
+        start = time.perf_counter()
+        chart = view._df_chart(spec) or ""
+        report.append(
+            {
+                "chart": spec["type"],
+                "max_points": max_points,
+                "downsample": method if max_points and spec is line else "",
+                "json_mb": len(chart) / 2**20,
+                "secs": time.perf_counter() - start,
+            }
+        )
+    _report(f"Chart data reduction over {rows:,} rows, 2 series", report)
+
+
+def bench_table(cells: Tuple[int, ...] = (10_000, 100_000)) -> None:
+    rng = np.random.default_rng(7)
+    view = View({}, pd.DataFrame())
+    rows = []
+    for size in cells:
+        cols = 10
+        index = pd.MultiIndex.from_product(
+            [[f"group {i}" for i in range(size // cols // 50)], range(50)],
+            names=["group", "lead"],
+        )
+        pivot = pd.DataFrame(
+            rng.normal(0, 1000, (len(index), cols)),
+            index=index,
+            columns=[f"col {i}" for i in range(cols)],
+        )
+        styler = _timeit(lambda pivot=pivot: view.df_style(pivot).to_html(), 1)
+        fast = _timeit(lambda pivot=pivot: df_html(pivot))
+        rows.append(
+            {
+                "cells": pivot.size,
+                "styler_s": styler,
+                "styler_kb": len(view.df_style(pivot).to_html()) / 1024,
+                "df_html_s": fast,
+                "df_html_kb": len(df_html(pivot)) / 1024,
+                "speedup": styler / fast,
+            }
+        )
+    _report("Pivot HTML", rows)
+
+
+def bench_top(sizes: Tuple[int, ...] = SIZES) -> None:
+    cols = ["group", "effort", "headline"]
+    rows = []
+    for size in sizes:
+        ds = DS(bow_like_df(size), keys="headline")
+
+        def first(ds: DS = ds) -> None:
+            ds._ranks.clear()
+            ds.top(cols, 10)
+
+        rows.append(
+            {
+                "rows": size,
+                "sort_head_s": _timeit(lambda ds=ds: ds.df.sort_values(cols).head(10)),
+                "top_first_s": _timeit(first),
+                "top_ranked_s": _timeit(lambda ds=ds: ds.top(cols, 10)),
+                "mid_page_s": _timeit(
+                    lambda ds=ds, mid=size // 2: ds.top(cols, 10, offset=mid)
+                ),
+            }
+        )
+    _report("Top 10 rows on 3 columns", rows)
+
+
+SANKEY_LEVELS = ["LOB", "Base Init", "Program", "Receiver", "PI Car"]
+
+
+def _sankey_rows(df: pd.DataFrame, levels: List[str], value_col: str) -> Any:
+    """Per level groupby and row loop the Sankey builder used to run."""
+    aggs = [
+        df.groupby(levels[: i + 1])[value_col].sum().reset_index()
+        for i in range(len(levels))
+    ]
+    labels = sorted({v for i, agg in enumerate(aggs) for v in agg[levels[i]]})
+    index = {label: i for i, label in enumerate(labels)}
+    source, target, value = [], [], []
+    for i in range(len(aggs) - 1, 0, -1):
+        for _, row in aggs[i].iterrows():
+            source.append(index[row[levels[i - 1]]])
+            target.append(index[row[levels[i]]])
+            value.append(row[value_col])
+    cmap = plt.colormaps["Set3"].resampled(len(source))
+    colors = [
+        f"rgba({int(r * 255)}, {int(g * 255)}, {int(b * 255)}, 0.8)"
+        for r, g, b, _ in cmap(np.linspace(0, 1, len(source)))
+    ]
+    return labels, source, target, value, colors
+
+
+def _sankey_vectorized(df: pd.DataFrame, levels: List[str], value_col: str) -> Any:
+    labels, source, target, value = sankey_links(df, levels, value_col)
+    return labels, source, target, value, link_colors(len(source))
+
+
+def bench_sankey(sizes: Tuple[int, ...] = SIZES) -> None:
+    base = fake_funding_df(1000)
+    rows = []
+    for size in sizes:
+        df = base.sample(size, replace=True, random_state=7, ignore_index=True)
+        old = _timeit(lambda df=df: _sankey_rows(df, SANKEY_LEVELS, "Funding"), 1)
+        new = _timeit(lambda df=df: _sankey_vectorized(df, SANKEY_LEVELS, "Funding"))
+        links = len(_sankey_vectorized(df, SANKEY_LEVELS, "Funding")[1])
+        rows.append(
+            {
+                "rows": size,
+                "links": links,
+                "rows_loop_s": old,
+                "vectorized_s": new,
+                "speedup": old / new,
+            }
+        )
+    _report(f"Sankey links over {len(SANKEY_LEVELS)} levels", rows)
+
+
+BENCHES: Dict[str, Callable[[], None]] = {
+    "keys": bench_keys,
+    "kv": bench_kv,
+    "join": bench_join,
+    "nested": bench_nested,
+    "upsert": bench_upsert,
+    "delta": bench_delta,
+    "index": bench_index,
+    "pipeline": bench_pipeline,
+    "lazy": bench_lazy,
+    "report": bench_report,
+    "charts": bench_charts,
+    "sankey": bench_sankey,
+    "downsample": bench_downsample,
+    "table": bench_table,
+    "top": bench_top,
+}
+
+
+if __name__ == "__main__":
+    for name in sys.argv[1:] or list(BENCHES):
+        BENCHES[name]()
@@ -1,17 +1,58 @@
+import gc
+import importlib.util
+import json
+import os
+import re
+import sys
+import tracemalloc
+import weakref
+from pathlib import Path
 from pprint import pformat
 from typing import Any, Dict
 
+import numpy as np
 import pandas as pd
+import plotly.graph_objects as go
 import pytest
 from icecream import ic
 
+from dns.composite import Composite
+from dns.downsample import chart_data, lttb, minmax
 from dns.ds import DS
-from dns.view import View
+from dns.pipeline import Pipeline
+from dns import reader as reader_module
+from dns.reader import Reader
+from dns.table import GRADIENT_STEPS, df_html
+from dns.utils import df_keys, df_pytypes, flatten_nested, xlate, xlate_stats
+from dns.view import (
+    Report,
+    ResultCache,
+    View,
+    compile_template,
+    export_chart,
+    report_fields,
+    sankey_links,
+)
 
-from .fixtures.tdf import fake_ait_df, fake_bow_df, fake_comp_df, fake_funding_df
+from .fixtures.tdf import (
+    RSEED,
+    fake_ait_df,
+    fake_bow_df,
+    fake_comp_df,
+    fake_funding_df,
+)
 
 TDIR = "tests/templates"
 ODIR = "tests/outputs"
+PEAK_RATIO = 1.5
+
+
+@pytest.fixture(scope="session", autouse=True)  # type: ignore  # noqa: PGH003
+def _source_cache(tmp_path_factory: pytest.TempPathFactory) -> Any:
+    """Keep the reader's Parquet cache out of the user's home directory."""
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setattr(reader_module, "CACHE_DIR", str(tmp_path_factory.mktemp("dns")))
+        yield
 
 
 @pytest.fixture(scope="module")  # type: ignore  # noqa: PGH003
@@ -96,3 +137,880 @@ def _sankey_chart(which, setup_data: Dict[str, DS]) -> None:
     else:
         raise ValueError("Invalid input")
     view._sankey(df, levels, value_col, title)
+
+
+def test_df_keys_matches_row_join() -> None:
+    df = fake_bow_df(20)
+    cols = ["Group", "Headline", "Effort", "Start Date"]
+    expected = df[cols].astype(str).agg("|".join, axis=1)
+    assert df_keys(df, cols).tolist() == expected.tolist()
+    assert df_keys(df, "Group").tolist() == df["Group"].tolist()
+
+
+def test_unique(setup_data: Dict[str, DS]) -> None:
+    ds = setup_data["bow"]
+    assert set(ds.unique("group")) == set(ds.df["group"].astype(str))
+    assert len(ds.unique(["group", "lead"])) <= len(ds.df)
+
+
+def test_kv_lazy_rows() -> None:
+    df = pd.DataFrame({"Id": range(20), "Name": [f"Row {i}" for i in range(20)]})
+    ds = DS(df, keys="Id", kv_cache=2)
+    key = "0"
+    assert ds[key] == ds.df.loc[key].to_dict()
+    assert ds["missing"] == {}
+    assert len(ds.kv) == len(ds.df)
+    ds[key] = {"name": "Renamed"}
+    assert ds[key]["name"] == "Renamed"
+    assert ds.df.loc[key, "name"] == "Renamed"
+    for k in ds.df.index[:5]:
+        ds[k]
+    assert len(ds.kv._rows) == ds.kv.maxsize
+
+
+def test_df_pytypes() -> None:
+    df = fake_bow_df(10)
+    df.loc[0, "Headline"] = None
+    types = df_pytypes(df)
+    assert types["Headline"] == "str"
+    assert types["Effort"] == "int"
+    assert types["Start Date"] == "date"
+    assert types["Subtasks"] == "pd"
+    df.drop(columns=["Subtasks"], inplace=True)
+    df["Ratio"] = df["Effort"] / 2
+    assert df_pytypes(df) == {
+        **{k: v for k, v in types.items() if k != "Subtasks"},
+        "Ratio": "float",
+    }
+
+
+def test_xlate_cache() -> None:
+    assert xlate("PI Car") == ("pi_car", "PI Car")
+    before = xlate_stats()
+    DS(fake_funding_df(10))
+    after = xlate_stats()
+    assert after["hits"] > before["hits"]
+    assert after["size"] <= after["maxsize"]
+
+
+def test_copy_free_construction() -> None:
+    tracemalloc.start()
+    df = pd.DataFrame(
+        np.random.default_rng(RSEED).random((200_000, 4)), columns=list("ABCD")
+    )
+    size = df.memory_usage(deep=True).sum()
+    ds = DS(df, copy=False)
+    hdf = ds.df_humanized
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert ds._odf is None
+    assert np.shares_memory(hdf["A"].to_numpy(), ds.df["a"].to_numpy())
+    assert peak < PEAK_RATIO * size
+
+
+def test_from_chunks(tmp_path: Path) -> None:
+    df = fake_funding_df(50)
+    keys = ["Program", "Receiver", "Giver"]
+    df = df.drop_duplicates(subset=keys)
+    csv = tmp_path / "funding.csv"
+    df.to_csv(csv, index=False)
+    jsonl = tmp_path / "funding.jsonl"
+    df.to_json(jsonl, orient="records", lines=True)
+    records = tmp_path / "funding.json"
+    df.to_json(records, orient="records")
+    full = DS(df, keys=keys)
+    for source in (str(csv), str(jsonl), str(records), csv.read_bytes()):
+        ds = DS.from_chunks(source, keys=keys, chunksize=7)
+        assert ds.keys == full.keys
+        assert ds.schema == full.schema
+        pd.testing.assert_frame_equal(ds.df, full.df)
+    assert DS.from_chunks(str(csv), chunksize=7).protocol == "csv"
+
+
+def test_from_chunks_key_dtypes(tmp_path: Path) -> None:
+    ids = [1, 2, 3, 4, 5, 6, 7, np.nan, 9, 10]
+    df = pd.DataFrame({"Group": list("AAAAABBBBB"), "Id": ids, "Effort": range(10)})
+    csv = tmp_path / "ids.csv"
+    df.to_csv(csv, index=False)
+    full = DS(str(csv), keys="Group,Id")
+    ds = DS.from_chunks(str(csv), keys="Group,Id", chunksize=5)
+    assert ds.df.index[0] == "A|1.0"
+    pd.testing.assert_frame_equal(ds.df, full.df)
+
+    steps = pd.DataFrame({"Step": [1, 2]})
+    children = {"Steps": {"keys": "Step"}}
+    parts = [
+        DS(pd.DataFrame({"Id": part, "Steps": [steps] * 5}), "Id", children)
+        for part in (ids[:5], ids[5:])
+    ]
+    merged = DS._merge(parts)
+    assert merged.df.index[0] == "1.0"
+    assert set(merged.children["steps"].df["pkey"]) == set(merged.df.index)
+
+    empty = tmp_path / "empty.jsonl"
+    empty.write_text("")
+    ds = DS.from_chunks(str(empty), keys="Id")
+    assert ds.df.empty
+    assert ds.keys == ["id"]
+
+
+def test_reader_cache(tmp_path: Path) -> None:
+    pytest.importorskip("pyarrow")
+    csv = tmp_path / "comp.csv"
+    fake_comp_df(30).to_csv(csv, index=False)
+    reader = Reader(cache_dir=str(tmp_path / "cache"))
+    _, parsed = reader.to_df(str(csv))
+    entry = reader._cached("csv", str(csv))
+    assert entry is not None
+    assert entry.exists()
+    _, cached = reader.to_df(str(csv))
+    pd.testing.assert_frame_equal(parsed, cached)
+    assert reader._cached("csv", str(csv)) == entry
+    assert (
+        Reader(cache_dir=str(reader.cache.cache_dir), sep=",")._cached("csv", str(csv))
+        != entry
+    )
+    reader.cache.max_bytes = 0
+    reader.cache.evict()
+    assert not entry.exists()
+    assert Reader(cache=False).cache is None
+
+
+def test_arrow_backend(tmp_path: Path) -> None:
+    pytest.importorskip("pyarrow")
+    path = str(tmp_path / "bow.arrow")
+    bow = DS(fake_bow_df(20), keys=["Group", "Headline"], arrow=path)
+    assert all(isinstance(dtype, pd.ArrowDtype) for dtype in bow.df.dtypes)
+    ds = DS.from_arrow(path)
+    assert ds.keys == bow.keys
+    assert ds.schema == bow.schema
+    key = ds.df.index[0]
+    assert ds[key] == bow[key]
+    assert ds.unique("group") == bow.unique("group")
+    assert list(ds.df_humanized.columns) == list(bow.df_humanized.columns)
+    view = View(f"{TDIR}/core/theme.yaml", ds)
+    pivot = view._df_pivot({"index": "Group", "values": "Effort", "aggfunc": "sum"})
+    assert pivot["Effort"].sum() == bow.df["effort"].sum()
+    rows = 5
+    assert len(view._df_table({"columns": ["Group", "Lead"], "rows": rows})) == rows
+
+    hdf = bow.df_humanized
+    assert _arrow_buffer(hdf["Effort"]) == _arrow_buffer(bow.df["effort"])
+    effort = hdf["Effort"].iloc[0]
+    bow[bow.df.index[0]] = {"Effort": effort + 1}
+    assert hdf["Effort"].iloc[0] == effort
+
+
+def _arrow_buffer(values: pd.Series) -> int:
+    return values.array.__arrow_array__().chunks[0].buffers()[1].address
+
+
+def test_arrow_missing(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setitem(sys.modules, "pyarrow", None)
+    bow = DS(fake_bow_df(5), keys=["Group", "Headline"])
+    with pytest.raises(ImportError, match=re.escape("legos[arrow]")):
+        bow.to_arrow(str(tmp_path / "bow.arrow"))
+    bow[bow.df.index[0]] = {"Effort": 1}
+    with pytest.raises(ImportError, match=re.escape("legos[arrow]")):
+        bow.save_delta(str(tmp_path / "1.parquet"))
+
+
+@pytest.mark.parametrize("executor", ["thread", "process"])
+def test_composite(executor: str) -> None:
+    comp = fake_comp_df(40)
+    people = comp[["Id", "Name", "Band"]]
+    pay = comp[["Id", "Salary", "Ic"]].iloc[:30]
+    mgrs = comp[["Id", "Mgr", "Band"]].iloc[10:]
+    loader = Composite.from_spec(
+        {
+            "composite": {
+                "datasets": [people, pay, {"id": "mgrs", "uri": mgrs}],
+                "keys": [["Id"], ["Id"], ["Id"]],
+                "how": ["left", "inner"],
+            }
+        },
+        executor=executor,
+    )
+    ds = loader.load()
+    assert set(loader.timings) == {"0", "1", "mgrs", "join"}
+    assert ds.protocol == "composite"
+    assert ds.keys == ["id"]
+    assert list(ds.df.columns) == [
+        "id",
+        "name",
+        "band",
+        "salary",
+        "ic",
+        "mgr",
+        "band_mgrs",
+    ]
+    assert len(ds.df) == len(mgrs)
+    assert ds[str(comp.loc[15, "Id"])]["salary"] == comp.loc[15, "Salary"]
+
+
+def test_join() -> None:
+    comp = fake_comp_df(40)
+    people = DS(comp[["Id", "Name", "Band", "Mgr Id"]], keys="Id")
+    pay = DS(comp[["Id", "Salary", "Band"]].iloc[:30], keys="Id")
+    mgrs = DS(comp[["Id", "Name"]].rename(columns={"Id": "Mgr Id"}), keys="Mgr Id")
+
+    inner = people.join(pay)
+    assert len(inner.df) == len(pay.df)
+    assert list(inner.df.columns) == [
+        "id",
+        "name",
+        "band_a",
+        "mgr_id",
+        "salary",
+        "band_b",
+    ]
+    assert inner.keys == ["id"]
+    assert len(people.join(pay, how="left").df) == len(people.df)
+    assert len(people.join(pay, how="outer").df) == len(people.df)
+    anti = people.join(pay, how="anti")
+    assert set(anti.df.index) == set(people.df.index) - set(pay.df.index)
+
+    with_mgr = people.join(mgrs, on="Mgr Id", how="left", validate="many_to_one")
+    assert with_mgr.df.index.equals(people.df.index)
+    key = people.df.index[0]
+    mgr = str(people[key]["mgr_id"])
+    assert with_mgr[key]["name_b"] == mgrs[mgr]["name"]
+    with pytest.raises(ValueError, match="not unique"):
+        people.join(mgrs, on="Mgr Id", validate="one_to_one")
+    with pytest.raises(ValueError, match="not unique"):
+        mgrs.join(people, rkeys="Mgr Id", lkeys="Mgr Id")
+
+
+def test_flatten_nested() -> None:
+    df = fake_bow_df(15)
+    for col in ("Subtasks", "Approvals", "Reviews"):
+        expected = pd.concat(df[col].tolist(), keys=df.index)
+        expected["pkey"] = expected.index.get_level_values(0)
+        expected.reset_index(inplace=True, drop=True)
+        pd.testing.assert_frame_equal(flatten_nested(df[col]), expected)
+
+
+def test_lazy_children() -> None:
+    children = {"Approvals": {"keys": "State,Step"}, "Reviews": {"keys": "Date"}}
+    ds = DS(fake_bow_df(10), keys=["Group", "Headline"], children=children)
+    assert list(ds.children) == ["approvals", "reviews"]
+    assert "approvals" not in ds.df.columns
+    assert ds.children.nested("approvals") is not None
+    approvals = ds.children["approvals"]
+    assert ds.children["approvals"] is approvals
+    assert set(approvals.df["pkey"]) == set(ds.df.index)
+    assert ds.children.nested("approvals") is None
+    assert ds.children.nested("reviews") is not None
+
+    kept = DS(fake_bow_df(5), children=children, drop_nested=False)
+    kept.children["approvals"]
+    assert kept.children.nested("approvals") is not None
+
+    df = fake_bow_df(5)
+    nested = weakref.ref(df["Approvals"].iloc[0])
+    ds = DS(df, keys=["Group", "Headline"], children=children)
+    del df
+    ds.children["approvals"]
+    gc.collect()
+    assert nested() is None
+
+
+def test_update_many() -> None:
+    ds = DS(fake_bow_df(20), keys=["Group", "Headline"])
+    first, second = ds.df.index[:2]
+    effort = ds[second]["effort"]
+    added = ds.update_many(
+        {
+            first: {"Effort": 30, "Dummy Col": 1},
+            second: {"Lead": "ZZ"},
+            "RRP|Brand New": {"Effort": 3},
+        }
+    )
+    assert added == ["RRP|Brand New"]
+    assert ds[first]["effort"] == ds.df["effort"].max()
+    assert ds[first]["dummy_col"] == 1
+    assert ds[second]["lead"] == "ZZ"
+    assert ds[second]["effort"] == effort
+    new = ds["RRP|Brand New"]
+    assert (new["group"], new["headline"], new["effort"]) == ("RRP", "Brand New", 3)
+    assert ds.schema["dummy_col"] == "float"
+    assert ds.xlations["human"]["dummy_col"] == "Dummy Col"
+
+    upd = ds.df.reset_index().iloc[:3][["group", "headline"]].assign(errors=-1)
+    assert ds.upsert(upd) == []
+    assert (ds.df["errors"].iloc[:3] == -1).all()
+
+    ids = DS(pd.DataFrame({"Id": [1, 2, 3], "Name": list("abc")}), keys="Id")
+    ids["9"] = {"Name": "z"}
+    assert ids.df["id"].dtype == np.int64
+    assert ids.df["id"].tolist() == [1, 2, 3, 9]
+
+
+def test_delta_snapshots(tmp_path: Path) -> None:
+    pytest.importorskip("pyarrow")
+    base = str(tmp_path / "bow.arrow")
+    ds = DS(fake_bow_df(20), keys=["Group", "Headline"])
+    ds.to_arrow(base)
+    assert not ds.changes
+    assert ds.save_delta(str(tmp_path / "none.parquet")) is None
+
+    first, second, third = ds.df.index[:3]
+    ds.update_many({first: {"Effort": 99}, "RRP|Brand New": {"Effort": 3}})
+    del ds.kv[second]
+    version = ds.changes.version
+    assert ds.changes.keys == {first, "RRP|Brand New"}
+    assert ds.changes.columns == {"effort"}
+    one = ds.save_delta(str(tmp_path / "1.parquet"))
+    assert not ds.changes
+    assert ds.changes.version == version
+
+    ds[third] = {"Lead": "ZZ"}
+    two = ds.save_delta(str(tmp_path / "2.parquet"))
+    assert pd.read_parquet(two).shape == (1, 1)
+
+    loaded = DS.from_arrow(base, deltas=[one, two])
+    assert not loaded.changes
+    assert sorted(loaded.df.index) == sorted(ds.df.index)
+    for key in (first, third, "RRP|Brand New"):
+        row = {col: val for col, val in ds[key].items() if pd.notna(val)}
+        assert {col: loaded[key][col] for col in row} == row
+        assert all(pd.isna(loaded[key][col]) for col in ds[key].keys() - row.keys())
+
+    last = ds.df.index[-1]
+    ds[third] = {"Lead": "YY"}
+    ds.df = ds.df.drop(index=third)
+    three = ds.save_delta(str(tmp_path / "3.parquet"))
+    assert last not in pd.read_parquet(three).index
+    loaded.apply_delta(three)
+    assert third not in loaded.df.index
+
+
+def test_secondary_indexes() -> None:
+    ds = DS(fake_bow_df(50), keys=["Group", "Headline"])
+    unique = ds.unique("group,lead")
+    ds.create_index("Group,Lead")
+    ds.create_index("Lead")
+    ds.create_index("Effort", kind="sorted")
+    ds.create_index("Start Date", kind="sorted")
+    assert ds.unique("group,lead") == unique
+    with pytest.raises(ValueError, match="Unknown index kind"):
+        ds.create_index("lead", kind="bitmap")
+
+    df = ds.df
+    low, high = 5, 20
+    found = ds.match({"Lead": ["AN", "BZ"], "Effort": {"between": [low, high]}})
+    expected = df[df["lead"].isin(["AN", "BZ"]) & df["effort"].between(low, high)]
+    assert found.index.equals(expected.index)
+    start = df["start_date"].iloc[0]
+    found = ds.match({"Start Date": {"between": [start, None]}, "Group": "DNS"})
+    expected = df[(df["start_date"] >= start) & (df["group"] == "DNS")]
+    assert found.index.equals(expected.index)
+    found = ds.match({"Assignee": {"regex": "^AN-"}})
+    assert (found["lead"] == "AN").all()
+
+    key = ds.df.index[0]
+    ds[key] = {"Lead": "ZZ", "Effort": 99}
+    lead = ds.indexes["hash", ("lead",)]
+    assert not lead.stale
+    assert lead.patched.tolist() == [0]
+    assert list(ds.match({"lead": "ZZ"}).index) == [key]
+    assert list(ds.match({"effort": {"between": [99, None]}}).index) == [key]
+    assert ds.match({"lead": "AN"}).index.equals(ds.df.index[ds.df["lead"] == "AN"])
+    ds["NEW|Row"] = {"Lead": "ZZ"}
+    assert lead.stale
+    assert list(ds.match({"lead": "ZZ"}).index) == [key, "NEW|Row"]
+    assert list(ds.match({"effort": {"between": [99, None]}}).index) == [key]
+    del ds.kv[key]
+    assert list(ds.match({"lead": "ZZ"}).index) == ["NEW|Row"]
+    assert "DNS|ZZ" not in ds.unique("group,lead")
+
+    scores = DS(pd.DataFrame({"Id": range(4), "Score": [1.0, np.nan, 3.0, np.nan]}))
+    scanned = [len(scores.match({"Score": [value]})) for value in (np.nan, None)]
+    scores.create_index("Score")
+    assert [len(scores.match({"Score": [value]})) for value in (np.nan, None)] == (
+        scanned
+    )
+
+
+def test_pipeline() -> None:
+    ds = DS(fake_bow_df(50), keys=["Group", "Headline"])
+    ds.create_index("Lead")
+    pipe = Pipeline.from_yaml(f"{TDIR}/usecases/lowcode/pipebow.yaml")
+    assert [op for op, _ in pipe.plan] == ["match", "math", "group", "project", "sort"]
+    out = pipe.run(ds)
+    assert pipe.timings
+    naive = Pipeline.from_yaml(f"{TDIR}/usecases/lowcode/pipebow.yaml", optimize=False)
+    assert naive.run(ds).df.equals(out.df)
+
+    df = ds.df[ds.df["lead"].isin(["AN", "BZ", "RC"])]
+    df = df.assign(load=df["effort"] * df["errors"])
+    expected = (
+        df.groupby(["group", "lead"])
+        .agg(
+            effort=("effort", "sum"), load=("load", "max"), items=("headline", "count")
+        )
+        .reset_index()
+        .sort_values(["effort", "group"], ascending=[False, True], kind="stable")
+    )
+    assert out.keys == ["group", "lead"]
+    assert list(out.df.columns) == ["group", "lead", "effort", "load", "items"]
+    assert out.df.reset_index(drop=True).equals(expected.reset_index(drop=True))
+    assert out[f"{expected['group'].iloc[0]}|{expected['lead'].iloc[0]}"]
+    assert "load" not in ds.df.columns
+
+    query = Pipeline.from_spec(
+        {
+            "q": {"Effort": {"between": [5, 10]}},
+            "aggr": {"by": "Group"},
+            "sort": "Group",
+        }
+    )
+    counts = query.run(ds).df["count"]
+    assert counts.sum() == ds.df["effort"].between(5, 10).sum()
+
+    melted = Pipeline([{"melt": {"values": "Effort,Errors"}}]).run(ds)
+    assert len(melted.df) == 2 * len(ds.df)
+    unmelted = Pipeline(
+        [{"unmelt": {"index": "key", "columns": "field", "values": "value"}}]
+    ).run(melted)
+    assert unmelted.df.set_index("key")["errors"].equals(ds.df["errors"])
+
+    first = ds.df.index[0]
+    changed = Pipeline(
+        [
+            {
+                "update": {
+                    "match": {"Headline": ds.df["headline"].iloc[0]},
+                    "set": {"Lead": "ZZ"},
+                }
+            },
+            {"delete": {"Lead": {"regex": "^(?:AN|BZ)$"}}},
+        ]
+    ).run(ds)
+    assert changed[first]["lead"] == "ZZ"
+    assert not changed.df["lead"].isin(["AN", "BZ"]).any()
+    assert ds[first]["lead"] != "ZZ"
+    with pytest.raises(ValueError, match="Unknown stage"):
+        Pipeline([{"explode": "Subtasks"}])
+
+
+def test_lazy_pushdown(tmp_path: Path) -> None:
+    nested = ["Subtasks", "Approvals", "Reviews"]
+    csv = tmp_path / "bow.csv"
+    fake_bow_df(60).drop(columns=nested).to_csv(csv, index=False)
+    keys = ["Group", "Headline"]
+    full = DS(str(csv), keys=keys)
+
+    lazy = DS.lazy(str(csv), keys=keys, chunksize=7, cache=False)
+    narrowed = lazy.select("Lead,Effort").match({"Lead": ["AN", "BZ"]})
+    narrowed = narrowed.match({"Effort": {"between": [5, 20]}})
+    assert lazy.plan["columns"] is None
+    assert narrowed.plan["columns"] == ["group", "headline", "lead", "effort"]
+    expected = full.match({"Lead": ["AN", "BZ"], "Effort": {"between": [5, 20]}})
+    assert set(narrowed.df.columns) == {"group", "headline", "lead", "effort"}
+    pd.testing.assert_frame_equal(narrowed.df, expected[narrowed.df.columns])
+
+    assert narrowed.collect().protocol == "csv"
+    assert narrowed.collect() is narrowed.collect()
+
+    pipe = Pipeline.from_yaml(f"{TDIR}/usecases/lowcode/pipebow.yaml")
+    assert pipe.run(lazy).df.equals(pipe.run(full).df)
+
+    typed = lazy.astype({"Lead": "category"}).select("Lead")
+    assert isinstance(typed.df["lead"].dtype, pd.CategoricalDtype)
+
+    view = View(f"{TDIR}/usecases/lowcode/specbow.yaml", lazy)
+    assert "Stakeholder" not in view.df.columns
+    assert {"Lead", "Errors", "Start Date"} <= set(view.df.columns)
+    counts = {"index": ["Lead"], "aggfunc": "count"}
+    pivot = View({"pivots": {"Counts": counts}}, lazy)._df_pivot(counts)
+    pd.testing.assert_frame_equal(pivot, View({}, full)._df_pivot(counts))
+
+    records = tmp_path / "bow.json"
+    full.df.reset_index(drop=True).to_json(records, orient="records")
+    lazy = DS.lazy(str(records), keys=keys, chunksize=7, cache=False)
+    narrowed = lazy.select("Lead,Effort").match({"Lead": ["AN", "BZ"]})
+    assert set(narrowed.df.columns) == {"group", "headline", "lead", "effort"}
+    assert len(narrowed.df) == len(full.match({"Lead": ["AN", "BZ"]}))
+
+
+def test_reader_parquet_pushdown(tmp_path: Path) -> None:
+    pytest.importorskip("pyarrow")
+    csv = tmp_path / "comp.csv"
+    fake_comp_df(40).to_csv(csv, index=False)
+    reader = Reader(cache_dir=str(tmp_path / "cache"))
+    _, full = reader.to_df(str(csv))
+    full.columns = [xlate(col)[0] for col in full.columns]
+    low = full["ic_incr"].median()
+    where = {"Ic Incr": {"between": [low, None]}, "not": {"Rating": ["DNM"]}}
+    _, df = reader.read(str(csv), columns=["Fnc Mgr", "Ic Incr"], where=where)
+    cols = [col for col in full.columns if col in ("fnc_mgr", "ic_incr")]
+    assert list(df.columns) == cols
+    mask = (full["ic_incr"] >= low) & (full["rating"] != "DNM")
+    assert df.reset_index(drop=True).equals(full.loc[mask, cols].reset_index(drop=True))
+
+
+def test_reader_cached_filter_types(tmp_path: Path) -> None:
+    pytest.importorskip("pyarrow")
+    df = pd.DataFrame(
+        {"Id": range(10), "Date": pd.date_range("2024-01-01", periods=10)}
+    )
+    source = str(tmp_path / "dates.json")
+    df.to_json(source, orient="records", date_format="iso")
+    reader = Reader(cache_dir=str(tmp_path / "cache"))
+    dates = {"Date": {"between": ["2024-01-02", "2024-01-04"]}}
+    cold = [
+        len(reader.read(source, where=where)[1]) for where in (dates, {"Id": ["3"]})
+    ]
+    assert reader._cached("json", source).exists()
+    warm = [
+        len(reader.read(source, where=where)[1]) for where in (dates, {"Id": ["3"]})
+    ]
+    assert cold == warm == [3, 0]
+    assert reader.read(source, where={"Id": [3]})[1]["id"].tolist() == [3]
+
+
+def test_compiled_report(tmp_path: Path) -> None:
+    spec = {
+        "header": "Body of Work",
+        "footer": "Team",
+        "pivots": {
+            "Effort": {"index": ["Lead"], "values": ["Effort"], "aggfunc": "sum"}
+        },
+        "tables": {
+            "Milestones": {"columns": ["Lead", "Headline", "Effort"], "rows": 5}
+        },
+        "layout": [
+            {"type": "pivot", "name": "Effort"},
+            {"type": "table", "name": "Milestones"},
+        ],
+    }
+    jtmpl = tmp_path / "report.html"
+    jtmpl.write_text(
+        "{{ header }}|{% for n, d in styled_data.items() %}{{ n }}{% endfor %}"
+    )
+    report = Report(spec, str(jtmpl))
+    assert report.template is compile_template(str(jtmpl))
+    ds = DS(fake_bow_df(20), keys=["Group", "Headline"])
+    html = report.render(ds)
+    assert html.startswith("Body of Work|EffortMilestones")
+    assert html == View(spec, ds).render(str(jtmpl))
+
+    stat = jtmpl.stat()
+    jtmpl.write_text("{{ footer }}")
+    os.utime(jtmpl, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert compile_template(str(jtmpl)) is not report.template
+    assert View(spec, ds).render(str(jtmpl)) == "Team"
+
+    with pytest.raises(ValueError, match="not pivots, charts or tables"):
+        Report({**spec, "layout": [{"name": "Missing"}]}, str(jtmpl))
+    with pytest.raises(ValueError, match="missing"):
+        Report({"layout": []}, str(jtmpl))
+
+
+def test_result_cache(tmp_path: Path) -> None:
+    spec = {
+        "header": "Body of Work",
+        "footer": "Team",
+        "pivots": {
+            "Effort": {"index": ["Lead"], "values": ["Effort"], "aggfunc": "sum"}
+        },
+        "tables": {"Leads": {"columns": ["Lead", "Assignee"], "rows": 5}},
+        "layout": [{"name": "Effort"}, {"name": "Leads"}],
+    }
+    jtmpl = tmp_path / "report.html"
+    jtmpl.write_text("{% for n, d in styled_data.items() %}{{ d }}{% endfor %}")
+    cache = ResultCache(cache_dir=str(tmp_path / "results"))
+    report = Report(spec, str(jtmpl), cache=cache)
+    bow = fake_bow_df(20)
+    ds = DS(bow, keys=["Group", "Headline"])
+    html = report.render(ds)
+    assert cache.stats == {"memory": 0, "disk": 0, "misses": 2}
+    assert report.render(ds) == html
+    assert cache.stats["memory"] == len(spec["layout"])
+
+    ds[ds.df.index[0]] = {"Errors": -1}
+    report.render(ds)
+    hits = 2 * len(spec["layout"])
+    assert cache.stats["memory"] == hits
+    ds[ds.df.index[0]] = {"Effort": 99}
+    assert report.render(ds) != html
+    assert cache.stats["memory"] == hits + 1
+    assert cache.stats["misses"] == len(spec["layout"]) + 1
+
+    fresh = ResultCache(cache_dir=str(tmp_path / "results"))
+    assert (
+        Report(spec, str(jtmpl), cache=fresh).render(
+            DS(bow, keys=["Group", "Headline"])
+        )
+        == html
+    )
+    assert fresh.stats["disk"] == len(spec["layout"])
+
+    ds = DS(bow, keys=["Group", "Headline"])
+    for max_bytes, kept in ((len(html), 2), (len(html) - 1, 1)):
+        bounded = ResultCache(max_bytes=max_bytes)
+        Report(spec, str(jtmpl), cache=bounded).render(ds)
+        assert len(bounded) == kept
+
+    totals = {
+        "header": "Totals",
+        "footer": "Team",
+        "pivots": {"Totals": {"index": ["Lead"], "aggfunc": "sum"}},
+        "layout": [{"name": "Totals"}],
+    }
+    ids = pd.DataFrame({"Id": range(6), "Lead": list("ABCABC"), "Effort": 1})
+    ds = DS(ids, keys="Id")
+    cache = ResultCache()
+    report = Report(totals, str(jtmpl), cache=cache)
+    html = report.render(ds)
+    ds["0"] = {"Effort": 10**6}
+    assert report.render(ds) != html
+    assert cache.stats == {"memory": 0, "disk": 0, "misses": 2}
+
+
+def test_parallel_report(tmp_path: Path) -> None:
+    spec = {
+        "header": "Body of Work",
+        "footer": "Team",
+        "pivots": {
+            "Effort": {"index": ["Lead"], "values": ["Effort"], "aggfunc": "sum"},
+            "Errors": {"index": ["Group"], "values": ["Errors"], "aggfunc": "max"},
+        },
+        "tables": {
+            "Milestones": {"columns": ["Lead", "Headline", "Effort"], "rows": 5}
+        },
+        "layout": [
+            {"type": "table", "name": "Milestones"},
+            {"type": "pivot", "name": "Errors"},
+            {"type": "pivot", "name": "Effort"},
+        ],
+    }
+    jtmpl = tmp_path / "report.html"
+    jtmpl.write_text(
+        "{% for n, d in styled_data.items() %}{{ n }}:{{ d }}|{% endfor %}"
+    )
+    ds = DS(fake_bow_df(50), keys=["Group", "Headline"])
+
+    def render(report: Report) -> str:
+        return re.sub(r"T_[0-9a-f]{5}", "T_", report.render(ds))
+
+    serial = Report(spec, str(jtmpl))
+    html = render(serial)
+    assert html.startswith("Effort:")
+    assert set(serial.timings) == {"Effort", "Errors", "Milestones"}
+
+    parallel = Report(spec, str(jtmpl), max_workers=3)
+    assert render(parallel) == html
+    assert set(parallel.timings) == set(serial.timings)
+    assert all(secs >= 0 for secs in parallel.timings.values())
+
+    cache = ResultCache()
+    cached = Report(spec, str(jtmpl), cache=cache, max_workers=2)
+    assert render(cached) == html
+    assert render(cached) == html
+    assert cached.timings == dict.fromkeys(serial.timings, 0.0)
+
+    with pytest.raises(ValueError, match="Unknown executor"):
+        View(spec, ds, chart_executor="fiber")
+
+
+def test_chart_export(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    def no_show(*args: Any, **kwargs: Any) -> None:
+        raise AssertionError("charts must not be shown while rendering")
+
+    monkeypatch.setattr(go.Figure, "show", no_show)
+    spec = {
+        "header": "Body of Work",
+        "footer": "Team",
+        "charts": {"Effort": {"type": "bar", "x": "Lead", "y": "Effort", "z": "Group"}},
+        "layout": [{"type": "chart", "name": "Effort"}],
+    }
+    jtmpl = tmp_path / "report.html"
+    jtmpl.write_text("{{ chart_mime }}|{{ charts['Effort'] }}")
+    ds = DS(fake_bow_df(20), keys=["Group", "Headline"])
+    report = Report(spec, str(jtmpl))
+    mime, chart = report.render(ds).split("|", 1)
+    assert mime == "application/json"
+    assert json.loads(chart)["data"][0]["type"] == "bar"
+    assert report.chart_stats["Effort"]["bytes"] == len(chart)
+    assert report.chart_stats["Effort"]["secs"] > 0
+
+    scripts = tmp_path / "scripts.html"
+    scripts.write_text("{{ plotly_script | safe }}")
+    inline = Report(spec, str(scripts)).render(ds)
+    assert inline.startswith("<script") and "cdn.plot.ly" not in inline
+    assert len(inline) > len(chart)
+    assert "cdn.plot.ly" in Report(spec, str(scripts), plotly_js="cdn").render(ds)
+
+    view = View(spec, ds)
+    columns = list(view.df.columns)
+    hist = {"type": "histogram", "x": "Start Date", "y": "Effort", "z": "Group"}
+    assert view.chart_figure(hist) is not None
+    assert list(view.df.columns) == columns
+
+    with pytest.raises(ValueError, match="Unknown chart format"):
+        View(spec, ds, chart_format="gif")
+    if importlib.util.find_spec("kaleido") is None:
+        fig = View(spec, ds).chart_figure(spec["charts"]["Effort"])
+        with pytest.raises(ValueError, match="needs kaleido"):
+            export_chart(fig, "png")
+
+
+def test_sankey_links() -> None:
+    df = fake_funding_df(200)
+    df.loc[df.index[:3], "Receiver"] = None
+    levels = ["LOB", "Base Init", "Program", "Receiver", "PI Car"]
+    labels, source, target, value = sankey_links(df, levels, "Funding")
+    assert labels == sorted(set(df[levels].stack()))
+
+    expected = pd.concat(
+        [
+            df.dropna(subset=levels[: i + 1])
+            .groupby([levels[i - 1], levels[i]])["Funding"]
+            .sum()
+            .rename_axis(["source", "target"])
+            .reset_index()
+            for i in range(1, len(levels))
+        ]
+    )
+    links = pd.DataFrame(
+        {
+            "source": np.array(labels)[source],
+            "target": np.array(labels)[target],
+            "Funding": value,
+        }
+    )
+    key = ["source", "target"]
+    assert len(links) == len(expected)
+    pd.testing.assert_series_equal(
+        links.groupby(key)["Funding"].sum(), expected.groupby(key)["Funding"].sum()
+    )
+
+    fig = View({}, df)._sankey(df, levels, "Funding", "Funding")
+    assert len(fig.data[0].link.color) == len(source)
+    with pytest.raises(ValueError, match="not found"):
+        sankey_links(df, ["LOB", "Missing"], "Funding")
+
+
+def test_sankey_fields(tmp_path: Path) -> None:
+    spec = {
+        "header": "Funding",
+        "footer": "Team",
+        "charts": {
+            "Flows": {"type": "sankey", "x": "LOB,Base Init,Program", "y": "Funding"}
+        },
+        "layout": [{"type": "chart", "name": "Flows"}],
+    }
+    assert report_fields(spec) == ["LOB", "Base Init", "Program", "Funding"]
+    jtmpl = tmp_path / "report.html"
+    jtmpl.write_text("{{ charts['Flows'] }}")
+    cache = ResultCache()
+    report = Report(spec, str(jtmpl), cache=cache)
+    df = fake_funding_df(50)
+    ds = DS(df)
+    html = report.render(ds)
+    ds[ds.df.index[0]] = {"Outcome": "Changed"}
+    assert report.render(ds) == html
+    ds[ds.df.index[0]] = {"LOB": "NEW"}
+    assert "NEW" in report.render(ds)
+    assert cache.stats == {"memory": 1, "disk": 0, "misses": 2}
+
+    csv = tmp_path / "funding.csv"
+    df.to_csv(csv, index=False)
+    view = View(spec, DS.lazy(str(csv), cache=False))
+    assert list(view.df.columns) == ["LOB", "Base Init", "Program", "Funding"]
+    assert view.chart_figure(spec["charts"]["Flows"]) is not None
+
+
+def test_chart_downsampling() -> None:
+    rng = np.random.default_rng(RSEED)
+    size, points, spike = 20_000, 200, 12_345
+    x = np.arange(size, dtype=float)
+    y = np.sin(x / 500) + rng.normal(0, 0.01, size)
+    y[spike] = 5.0
+    picked = lttb(x, y, points)
+    assert len(picked) == points
+    assert picked[0] == 0
+    assert picked[-1] == size - 1
+    assert spike in picked
+    shuffled = rng.permutation(size)
+    kept = shuffled[minmax(x[shuffled], y[shuffled], points)]
+    assert {int(np.argmax(y)), int(np.argmin(y))} <= set(kept)
+    assert len(kept) <= points
+
+    df = pd.DataFrame(
+        {
+            "Day": pd.Timestamp("2024-01-01") + pd.to_timedelta(shuffled, "min"),
+            "Errors": y[shuffled],
+            "Group": np.where(shuffled % 2, "DNS", "EES"),
+        }
+    )
+    for method in ("lttb", "minmax"):
+        line = chart_data(df, "line", "Day", "Errors", "Group", points, method)
+        assert line["Day"].is_monotonic_increasing
+        assert line.groupby("Group").size().max() <= points
+        assert line["Errors"].max() == df["Errors"].max()
+    bar = chart_data(df, "bar", "Group", "Errors", "Group", points)
+    assert bar["Group"].tolist() == ["DNS", "EES"]
+    assert bar["Errors"].sum() == pytest.approx(df["Errors"].sum())
+
+    spec = {"type": "line", "x": "Day", "y": "Errors", "z": "Group"}
+    full = View({}, df, chart_format="json", max_points=None)._df_chart(spec)
+    reduced = View({}, df, chart_format="json", max_points=points)._df_chart(spec)
+    assert len(reduced or "") * 10 < len(full or "")
+    with pytest.raises(ValueError, match="Unknown downsampling"):
+        View({}, df, downsample="every_other")
+
+
+def test_table_html() -> None:
+    df = fake_bow_df(60)
+    df.loc[df.index[:4], "Errors"] = -df.loc[df.index[:4], "Errors"] - 1
+    pivot = pd.pivot_table(
+        df, index=["Group", "Lead"], values=["Effort", "Errors"], aggfunc="sum"
+    )
+    view = View({}, df)
+    cells = re.compile(r"<td[^>]*>([^<]*)</td>")
+    styled = view.df_style(pivot).to_html()
+    html = df_html(pivot, table_id="T_pivot")
+    assert cells.findall(html) == cells.findall(styled)
+    assert html.count('class="row_heading level0"') == pivot.index.levels[0].size
+    assert html.count(' neg">') == (pivot < 0).to_numpy().sum()
+    steps = {int(step) for step in re.findall(r'class="g(\d+)', html)}
+    assert {0, GRADIENT_STEPS - 1} <= steps
+    assert '<th class="index_name">Group</th>' in html
+
+    table = view._df_table({"columns": ["Lead", "Headline", "Effort"], "rows": 8})
+    html = df_html(table, show_index=False)
+    assert cells.findall(html) == cells.findall(view.df_style(table).to_html())
+    assert "row_heading" not in html
+
+
+def test_top_rows() -> None:
+    df = fake_bow_df(200)
+    df.loc[df.index[::7], "Effort"] = np.nan
+    ds = DS(df, keys=["Group", "Headline"])
+    cols = [xlate("Lead")[0], xlate("Effort")[0]]
+    expected = ds.df.sort_values(cols, kind="stable")
+    for offset, limit in ((0, 7), (5, 7), (195, 10), (300, 5)):
+        pd.testing.assert_frame_equal(
+            ds.top(["Lead", "Effort"], limit, offset),
+            expected.iloc[offset : offset + limit],
+        )
+    assert list(ds._ranks) == [tuple(cols)]
+
+    ranks = ds._ranks[tuple(cols)][1]
+    ds[ds.df.index[-1]] = {"Effort": -1}
+    assert ds.top("Effort", 1).index[0] == ds.df.index[-1]
+    assert ds._ranks[tuple(cols)][1] is ranks
+    ds.top(["Lead", "Effort"], 1)
+    assert ds._ranks[tuple(cols)][1] is not ranks
+
+    view = View({}, ds)
+    spec = {"columns": ["Lead", "Headline", "Effort"], "rows": 5, "offset": 10}
+    pd.testing.assert_frame_equal(
+        view._df_table(spec),
+        view.df[spec["columns"]].sort_values(spec["columns"], kind="stable")[10:15],
+    )
+    with pytest.raises(ValueError, match="not found"):
+        ds.top("Missing")